@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'HAL.settings')
 
 application = get_asgi_application()
+
+# Only a server process needs the tag autocomplete index, load it before the first request asks
+from question.tag_index import tag_index, get_setting  # noqa: E402
+
+if get_setting('WARM'):
+    tag_index.warm()
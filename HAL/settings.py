@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -84,10 +85,60 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts so concurrent votes queue up instead of failing
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# HAL_CACHE picks the backend: file (the default), redis or locmem.
+# file and redis are shared by the worker processes. locmem is per process and only suits a
+# single-process server: the question versions (ETags) and cached votes are then only bumped in
+# the process that handled the write, other processes serve stale data for up to their TIMEOUT.
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'hal',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('HAL_CACHE_DIR', str(BASE_DIR / '.cache')),
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/0'),
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[os.environ.get('HAL_CACHE', 'file')],
+}
+
+# Runs the tests on a locmem cache whatever HAL_CACHE says, see HAL.test_runner
+TEST_RUNNER = 'HAL.test_runner.TestRunner'
+
+# Rendered questions of QuestionDetailView, see question.detail_cache
+QUESTION_DETAIL_CACHE = {
+    'CACHE': 'default',
+    'TIMEOUT': 300,  # seconds
+    'LOG_EVERY': 1000,  # lookups between two hit ratio log lines of each process
+}
+
+# Each user's votes for MyVotesView, see question.votes.votes_for, CACHE None turns the cache off
+MY_VOTES = {
+    'CACHE': 'default',
+    'TIMEOUT': 300,  # seconds
+    'MAX_CACHED': 5000,
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -162,4 +213,54 @@ ELASTICSEARCH_DSL = {
     'default': {
         'hosts': 'http://localhost:9200'  # Elasticsearch host
     },
-}
\ No newline at end of file
+}
+
+# Index changes through the coalescing bulk queue instead of one request per save
+ELASTICSEARCH_DSL_SIGNAL_PROCESSOR = 'question.indexing.QueuedSignalProcessor'
+SEARCH_INDEXING = {
+    'BACKEND': 'question.indexing.ElasticsearchBackend',  # question.indexing.LocalBackend in tests
+    'FLUSH_INTERVAL': 1.0,  # seconds
+    'MAX_BATCH': 500,
+    'REFRESH': False,  # False, True or 'wait_for'
+}
+
+# Question views are counted in the cache and written in batches by the flusher thread of any
+# worker or by manage.py flush_view_counts, see question.view_counter
+VIEW_COUNTER = {
+    'CACHE': 'default',  # shared by the workers, locmem only suits a single process
+    'FLUSH_INTERVAL': 30,  # seconds
+    'MAX_PENDING': 1000,  # views recorded by a worker before an early flush
+}
+
+# Submitted text is scored in batches, optionally in worker processes
+PROFANITY = {
+    'CACHE_SIZE': 10000,  # classified texts kept in the LRU
+    'POOL_WORKERS': 0,  # > 0 runs the model in that many worker processes
+    'BATCH_WINDOW': 0.005,  # seconds
+    'MAX_BATCH': 256,
+}
+
+# Tag name -> id cache of question.tags.TagResolver
+TAG_RESOLVER = {
+    'CACHE_SIZE': 5000,
+    'TIMEOUT': 300,  # seconds
+}
+
+# In-memory prefix index serving tag autocomplete
+TAG_INDEX = {
+    'TIMEOUT': 300,  # seconds
+    'LIMIT': 100,
+    'WARM': True,  # loaded in the background when HAL.wsgi or HAL.asgi starts a server process
+}
+
+# The question detail cache logs the hit ratio of each worker every LOG_EVERY lookups
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'question.detail_cache': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
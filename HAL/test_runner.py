@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    DiscoverRunner with every cache alias on a locmem cache of the test process.
+
+    The configured backend may be the file or redis cache the dev server
+    uses, whose question versions and cached votes would otherwise carry
+    over between test runs, keyed by ids the test databases hand out again.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        local = {**settings.CACHE_BACKENDS['locmem'], 'LOCATION': 'hal-tests'}
+        self._local_caches = override_settings(CACHES={alias: local for alias in settings.CACHES})
+        self._local_caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._local_caches.disable()
+        super().teardown_test_environment(**kwargs)
@@ -6,7 +6,11 @@ from reversion.admin import VersionAdmin
 class FlagAdmin(admin.ModelAdmin):
     list_display = ('user', 'reason', 'resolved', 'created', 'updated')
     list_filter = ('resolved', 'reason')
-    search_fields = ('user__email', 'description')
+    # Exact matches, a '%term%' LIKE over the joined users scans the whole table
+    search_fields = ('=user__username', '=user__email')
+    list_select_related = ('user',)
+    raw_id_fields = ('user', 'profile', 'question', 'answer', 'comment')
+    show_full_result_count = False
 
 @admin.register(Question)
 class QuestionAdmin(VersionAdmin):
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class QuestionConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'question'
+
+    def ready(self):
+        # Connects the receivers removing the flag counters and votes of deleted posts and keeping the tag index current
+        from . import flags, tag_index, votes  # noqa: F401
@@ -0,0 +1,59 @@
+import hashlib
+import json
+
+from django.db.models import Count, Max
+from django.http import HttpResponseNotModified
+from django.utils.http import parse_etags
+from reversion.models import Version
+
+
+def make_etag(*parts):
+    """A strong ETag over `parts`, which must describe everything the response body is built from"""
+    raw = json.dumps(parts, separators=(',', ':'), default=str).encode()
+    return '"%s"' % hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def not_modified(request, etag):
+    """A 304 response when the request's If-None-Match matches `etag`, else None"""
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return None
+    tags = parse_etags(header)
+    # Weak comparison, as If-None-Match requires
+    if '*' in tags or etag.removeprefix('W/') in {tag.removeprefix('W/') for tag in tags}:
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+    return None
+
+
+def with_etag(response, etag):
+    if response.status_code == 200:
+        response['ETag'] = etag
+    return response
+
+
+def versions_etag(model, pk, *params):
+    """ETag of the version list of one object, from the newest version id and the number of versions"""
+    stats = Version.objects.get_for_object_reference(model, pk).aggregate(last=Max('id'), count=Count('id'))
+    return make_etag('versions', model._meta.label, pk, stats['last'], stats['count'], params)
+
+
+# Serialized fields written by queryset.update(), which leaves `updated` alone
+PAGE_FIELDS = ('upvotes', 'downvotes', 'views_count', 'is_accepted')
+
+
+def page_etag(rows, *params):
+    """
+    ETag of one feed page, from the id and updated timestamp of its rows.
+
+    The fields that change without a save() are added: the counters, the
+    accepted flag of answers and the tags of questions, whose m2m writes do
+    not touch the question row. Tags are read from the prefetched `tags`.
+    """
+    fields = [name for name in PAGE_FIELDS if rows and hasattr(rows[0], name)]
+    tags = bool(rows) and hasattr(rows[0], 'tags')
+    return make_etag(params, [
+        (row.id, row.updated, *(getattr(row, name) for name in fields), sorted(tag.pk for tag in row.tags.all()) if tags else None)
+        for row in rows
+    ])
@@ -0,0 +1,159 @@
+import hashlib
+import logging
+import multiprocessing
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'CACHE_SIZE': 10000,  # classified texts remembered, 0 disables the cache
+    'POOL_WORKERS': 0,  # worker processes running the model, 0 runs it on the calling thread
+    'BATCH_WINDOW': 0.005,  # seconds the pool waits to gather texts from concurrent requests
+    'MAX_BATCH': 256,  # texts sent to a worker in one predict call
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'PROFANITY', {}).get(name, DEFAULTS[name])
+
+
+def _predict(texts):
+    # Imported here so pool workers load the model on first use and not at spawn
+    from profanity_check import predict
+    return [bool(flag) for flag in predict(texts)]
+
+
+def _digest(text):
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+class ProfanityClassifier:
+    """
+    Scores texts with profanity_check, many at a time.
+
+    `classify` takes every text of a request and runs the model once for all
+    of them. Results are kept in an LRU keyed by a hash of the text, so tags
+    and bodies seen before are not scored again. With POOL_WORKERS set the
+    model runs in worker processes, and texts from concurrent requests that
+    arrive within BATCH_WINDOW are sent to them as one batch.
+    """
+
+    def __init__(self):
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._batcher = None
+        self.hits = 0
+        self.misses = 0
+
+    def classify(self, texts):
+        """Return one boolean per text, True when the text is profane"""
+        keys = [_digest(text) for text in texts]
+        results = {}
+        with self._lock:
+            for key in keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    results[key] = self._cache[key]
+                    self.hits += 1
+
+        todo = {}
+        for key, text in zip(keys, texts):
+            if key not in results:
+                todo.setdefault(key, text)
+        if todo:
+            flags = self._run(list(todo.values()))
+            results.update(zip(todo, flags))
+            self._remember(zip(todo, flags))
+            with self._lock:
+                self.misses += len(todo)
+        return [results[key] for key in keys]
+
+    def is_profane(self, text):
+        return self.classify([text])[0]
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = self.misses = 0
+
+    def _remember(self, items):
+        size = get_setting('CACHE_SIZE')
+        if not size:
+            return
+        with self._lock:
+            for key, flag in items:
+                self._cache[key] = flag
+                self._cache.move_to_end(key)
+            while len(self._cache) > size:
+                self._cache.popitem(last=False)
+
+    def _run(self, texts):
+        if not get_setting('POOL_WORKERS'):
+            return _predict(texts)
+        if self._batcher is None:
+            with self._lock:
+                if self._batcher is None:
+                    self._batcher = PoolBatcher(get_setting('POOL_WORKERS'))
+        return self._batcher.submit(texts).result()
+
+
+class PoolBatcher:
+    """Gathers texts from concurrent callers and scores them in worker processes"""
+
+    def __init__(self, workers):
+        # spawn, forking a process that runs threads can deadlock the children
+        self._pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='profanity-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, texts):
+        future = Future()
+        self._queue.put((texts, future))
+        return future
+
+    def _run(self):
+        while True:
+            pending = [self._queue.get()]
+            size = len(pending[0][0])
+            window = get_setting('BATCH_WINDOW')
+            while size < get_setting('MAX_BATCH'):
+                try:
+                    item = self._queue.get(timeout=window)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                size += len(item[0])
+            self._dispatch(pending)
+
+    def _dispatch(self, pending):
+        texts = [text for batch, _ in pending for text in batch]
+        try:
+            job = self._pool.submit(_predict, texts)
+        except Exception as e:
+            logger.exception('Submitting a profanity batch failed')
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        job.add_done_callback(lambda job: self._resolve(job, pending))
+
+    def _resolve(self, job, pending):
+        try:
+            flags = job.result()
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        start = 0
+        for batch, future in pending:
+            future.set_result(flags[start:start + len(batch)])
+            start += len(batch)
+
+
+classifier = ProfanityClassifier()
@@ -1,58 +1,149 @@
 from django.core.exceptions import ValidationError
-from profanity_check import predict
 import re
 import defusedxml.ElementTree as ET
 import guardrails as gr
+
+from .profanity import classifier
 # from guardrails.validators import Validator
 
-def validate_no_contact_info(content, user):
+# (rule, pattern, message) checked for everyone but superusers
+CONTACT_RULES = [
+    # the optional leading '+' of a number cannot change whether one is found, leaving it out lets re skip ahead to digits
+    ('phone', r'\d[\d -]{8,}\d', "Content cannot contain phone numbers."),
+    ('email', r'(?i:\b[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}\b)', "Content cannot contain email addresses."),
+    ('url', r'https?://(?:www\.)?(?:[a-zA-Z0-9\-]+\s*\.\s*)+[a-zA-Z]{2,}(?:[^\s]*)', "Content cannot contain website URLs."),
+    ('url2', r'www\.(?:[a-zA-Z0-9\-]+\s*\.\s*)+[a-zA-Z]{2,}(?:[^\s]*)', "Content cannot contain website URLs."),
+]
+
+# (rule, pattern, message) checked for everyone
+MALICIOUS_RULES = [
+    ('sql', r"(?i:(\bUNION\b|\bSELECT\b|\bINSERT\b|\bUPDATE\b|\bDELETE\b))", "Content contains SQL injection patterns."),
+    ('sql_comment', r"(--|#|\/\*|\*\/)", "Content contains SQL injection patterns."),
+    ('xss_script', r'(?i:<script\b[^<]*(?:(?!<\/script>)<[^<]*)*<\/script>)', "Content contains cross-site scripting (XSS) patterns."),
+    ('xss_javascript', r'(?i:(?<=\w)=\"javascript:)', "Content contains cross-site scripting (XSS) patterns."),
+]
+
+# A literal every match of the rule contains, text without it is not searched at all
+RULE_HINTS = {
+    'email': '@',
+    'xss_script': '<',
+    'xss_javascript': '=',
+}
+
+PROFANITY_MESSAGE = "Content contains inappropriate language."
+
+
+class Violation:
+    """The first rule a submission broke: which field, which rule and the message shown to the user"""
+
+    def __init__(self, field, rule, message):
+        self.field = field
+        self.rule = rule
+        self.message = message
+
+    def __repr__(self):
+        return f'Violation(field={self.field!r}, rule={self.rule!r})'
+
+    def as_error(self):
+        return ValidationError(self.message, code=self.rule, params={'field': self.field})
+
+
+class ContentScanner:
+    """
+    Checks text against a fixed list of rules, compiled once at import.
+
+    The rules are tried one after the other rather than as one alternation:
+    each pattern alone keeps the literal prefix scan of `re`, which a
+    combined pattern loses, and measured about 1.7x slower on prose. Rules
+    with a hint are skipped outright for text missing that literal.
+    """
+
+    def __init__(self, rules, hints=RULE_HINTS):
+        self.rules = [(rule, re.compile(pattern), hints.get(rule)) for rule, pattern, _ in rules]
+        self.messages = {rule: message for rule, _, message in rules}
+
+    def scan(self, content):
+        """Return the name of the first rule matching `content`, None when it is clean"""
+        for rule, pattern, hint in self.rules:
+            if hint is not None and hint not in content:
+                continue
+            if pattern.search(content):
+                return rule
+        return None
+
 
-    # Check for inappropriate content using profanity-check
-    if predict([content])[0] == 1:
-        raise ValidationError("Content contains inappropriate language.")
+full_scanner = ContentScanner(CONTACT_RULES + MALICIOUS_RULES)
+contact_scanner = ContentScanner(CONTACT_RULES)
+malicious_scanner = ContentScanner(MALICIOUS_RULES)
+
+
+def _iter_fields(fields):
+    for name, value in fields.items():
+        if isinstance(value, (list, tuple)):
+            for item in value:
+                if item:
+                    yield name, item
+        elif value:
+            yield name, value
+
+
+def scan_fields(fields, user, profanity=True):
+    """
+    Scan every field of a submission and return the first Violation, or None.
+
+    `fields` maps field names to a string or a list of strings (tags), empty
+    values are skipped. The profanity model scores all the texts at once.
+    """
+    texts = list(_iter_fields(fields))
+    if not texts:
+        return None
+
+    if profanity:
+        for (name, _), flagged in zip(texts, classifier.classify([text for _, text in texts])):
+            if flagged:
+                return Violation(name, 'profanity', PROFANITY_MESSAGE)
+
+    scanner = malicious_scanner if user.is_superuser else full_scanner
+    for name, text in texts:
+        rule = scanner.scan(text)
+        if rule is not None:
+            return Violation(name, rule, scanner.messages[rule])
+    return None
+
+
+def validate_submission(fields, user):
+    """Raise a ValidationError for the first rule any field of the submission breaks"""
+    violation = scan_fields(fields, user)
+    if violation is not None:
+        raise violation.as_error()
+
+
+def changed_fields(instance, submitted):
+    """
+    The entries of `submitted` that differ from what `instance` holds.
+
+    Fields left out of the request (None) are not changes, so an edit that
+    resends the stored text unchanged has nothing to validate or write.
+    """
+    return {name: value for name, value in submitted.items() if value is not None and value != getattr(instance, name)}
+
+
+def validate_no_contact_info(content, user):
+    if classifier.is_profane(content):
+        raise ValidationError(PROFANITY_MESSAGE, code='profanity')
 
     if user.is_superuser:# or user.is_premium:
         return  # Skip validation for premium or superusers
 
-    # Regular expressions for phone numbers, emails, and URLs
-    phone_regex = re.compile(r'(\+?\d[\d -]{8,}\d)')
-    email_regex = re.compile(r'\b[A-Z0-9._%+-]+@[A-Z0-9.-]+\.[A-Z]{2,}\b', re.IGNORECASE)
-    url_regex = re.compile(r'https?://(?:www\.)?(?:[a-zA-Z0-9\-]+\s*\.\s*)+[a-zA-Z]{2,}(?:[^\s]*)')
-    url_regex2 = re.compile(r'www\.(?:[a-zA-Z0-9\-]+\s*\.\s*)+[a-zA-Z]{2,}(?:[^\s]*)')
-    
-    # Check for phone numbers, emails, and URLs
-    if phone_regex.search(content):
-        raise ValidationError("Content cannot contain phone numbers.")
-    if email_regex.search(content):
-        raise ValidationError("Content cannot contain email addresses.")
-    if url_regex.search(content):
-        raise ValidationError("Content cannot contain website URLs.")
-    if url_regex2.search(content):
-        raise ValidationError("Content cannot contain website URLs.")
-    
+    rule = contact_scanner.scan(content)
+    if rule is not None:
+        raise ValidationError(contact_scanner.messages[rule], code=rule)
+
 
 def validate_for_malicious_content(content):
-    # Basic SQL Injection patterns
-    sql_injection_patterns = [
-        re.compile(r"(\bUNION\b|\bSELECT\b|\bINSERT\b|\bUPDATE\b|\bDELETE\b)", re.IGNORECASE),
-        re.compile(r"(--|#|\/\*|\*\/)", re.IGNORECASE)
-    ]
-
-    # Basic XSS patterns
-    xss_patterns = [
-        re.compile(r'<script\b[^<]*(?:(?!<\/script>)<[^<]*)*<\/script>', re.IGNORECASE),
-        re.compile(r'[\w]+=\"javascript:', re.IGNORECASE)
-    ]
-    
-    # Validate for SQL Injection
-    for pattern in sql_injection_patterns:
-        if pattern.search(content):
-            raise ValidationError("Content contains SQL injection patterns.")
-    
-    # Validate for XSS
-    for pattern in xss_patterns:
-        if pattern.search(content):
-            raise ValidationError("Content contains cross-site scripting (XSS) patterns.")
+    rule = malicious_scanner.scan(content)
+    if rule is not None:
+        raise ValidationError(malicious_scanner.messages[rule], code=rule)
 
     # Validate for malicious XML
     # try:
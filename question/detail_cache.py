@@ -0,0 +1,123 @@
+import logging
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import Question, Tag
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'CACHE': 'default',  # alias in CACHES
+    'TIMEOUT': 300,  # seconds a rendered question is kept, also bounds staleness the versions do not see
+    'LOG_EVERY': 1000,  # lookups between two log lines with the hit ratio of the process, 0 for none
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'QUESTION_DETAIL_CACHE', {}).get(name, DEFAULTS[name])
+
+
+class QuestionDetailCache:
+    """
+    Read-through cache of the payload rendered by QuestionDetailView.
+
+    Each question has a version number in the cache, the payload is stored
+    under a key that includes it. Anything that changes what the payload
+    shows bumps the version instead of deleting keys, so a reader that loaded
+    the row before the change can only store its result under the old
+    version, which nobody reads again. A missing version starts from the
+    current time in nanoseconds, never from a number used before.
+
+    Versions expire with the payloads, so a process that missed a bump made
+    elsewhere, as with the per-process locmem backend, is at most TIMEOUT
+    seconds behind, payload and version (the ETag) alike.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def cache(self):
+        return caches[get_setting('CACHE')]
+
+    def get(self, pk, load):
+        """Return the payload of question `pk`, calling `load(pk)` to build it on a miss. None when it does not exist."""
+        key = f'question:{pk}:detail:{self.version(pk)}'
+        payload = self.cache.get(key)
+        with self._lock:
+            if payload is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            log_every = get_setting('LOG_EVERY')
+            report = log_every and (self.hits + self.misses) % log_every == 0
+        if report:
+            logger.info('Question detail cache of process %(pid)d: %(hits)d hits, %(misses)d misses, hit ratio %(hit_ratio).3f', self.stats())
+        if payload is None:
+            payload = load(pk)
+            if payload is not None:
+                self.cache.set(key, payload, get_setting('TIMEOUT'))
+        return payload
+
+    def version(self, pk):
+        key = f'question:{pk}:version'
+        version = self.cache.get(key)
+        if version is None:
+            self.cache.add(key, time.time_ns(), get_setting('TIMEOUT'))
+            version = self.cache.get(key)
+        return version
+
+    def bump(self, *pks):
+        """Make the cached payloads of the given questions unreachable"""
+        for pk in pks:
+            key = f'question:{pk}:version'
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.add(key, time.time_ns(), get_setting('TIMEOUT'))
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {'pid': os.getpid(), 'hits': self.hits, 'misses': self.misses, 'hit_ratio': self.hits / total if total else 0.0}
+
+
+detail_cache = QuestionDetailCache()
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def _question_changed(sender, instance, **kwargs):
+    detail_cache.bump(instance.pk)
+
+
+@receiver(m2m_changed, sender=Question.tags.through)
+def _question_tags_changed(sender, instance, action, reverse=False, pk_set=None, **kwargs):
+    if reverse and action == 'pre_clear':
+        # tag.questions.clear() does not say which questions it touches, and they are gone afterwards
+        instance._detail_cache_clearing = list(Question.objects.filter(tags=instance).values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        detail_cache.bump(instance.pk)
+    elif action == 'post_clear':
+        detail_cache.bump(*getattr(instance, '_detail_cache_clearing', ()))
+    else:
+        detail_cache.bump(*pk_set)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def _tag_changed(sender, instance, created=False, **kwargs):
+    # The payload lists tag names, a renamed or deleted tag changes every question carrying it
+    if not created:
+        detail_cache.bump(*Question.tags.through.objects.filter(tag_id=instance.pk).values_list('question_id', flat=True))
@@ -5,6 +5,9 @@ from django_elasticsearch_dsl.registries import registry
 from .models import Question, Answer, Comment, Tag
 
 
+# Elasticsearch refuses from + size beyond index.max_result_window
+MAX_RESULT_WINDOW = 10000
+
 questions_index = Index('questions')
 questions_index.settings(
     number_of_shards=1,
@@ -20,17 +23,29 @@ class QuestionDocument(Document):
             'raw': fields.KeywordField(),
         }
     )
+    id = fields.IntegerField()  # tiebreaker for search_after pagination
     body = fields.TextField()
     tags = fields.ListField(fields.TextField())  
     user = fields.TextField(attr='user.username')
     views_count = fields.IntegerField()  
     upvotes = fields.IntegerField()  
     downvotes = fields.IntegerField()  
+    popularity = fields.FloatField()  # Question.popularity, kept current by vote and view syncs
     created = fields.DateField()
 
     class Django:
         model = Question  
         
+    # Model fields synced with a partial update, mapped to the document fields they feed
+    partial_update_fields = {
+        'views_count': ('views_count', 'popularity'),
+        'upvotes': ('upvotes', 'popularity'),
+        'downvotes': ('downvotes',),
+    }
+
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('user').prefetch_related('tags')
 
     def prepare_tags(self, instance):
         
@@ -86,6 +101,9 @@ class AnswerDocument(Document):
         model = Answer
         
 
+    def get_queryset(self):
+        return super().get_queryset().select_related('user', 'question')
+
     def prepare_question(self, instance):
         return {
             'id': instance.question.id,
@@ -109,3 +127,6 @@ class CommentDocument(Document):
     class Django:
         model = Comment
         
+    def get_queryset(self):
+        return super().get_queryset().select_related('user')
+
@@ -0,0 +1,97 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Count, Min
+from django.db.models.functions import Coalesce, Now
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from user import reputation
+from .models import Question, Answer, Comment, Flag, FlagCounter
+
+
+PENALTY_THRESHOLD = 6  # flags on one post that cost its author the penalty
+PENALTY = -100
+
+# A flag counts against the most specific content it names, the way FlagContentView picks it
+FLAG_TARGETS = (
+    (Comment, 'comment', {}),
+    (Answer, 'answer', {'comment__isnull': True}),
+    (Question, 'question', {'answer__isnull': True, 'comment__isnull': True}),
+)
+
+
+def flags_on(model, ids):
+    """Q matching the flags counted against the `model` rows with these ids"""
+    for target, field, extra in FLAG_TARGETS:
+        if target is model:
+            return Q(**{f'{field}__in': ids}, **extra)
+    raise ValueError(f'{model.__name__} cannot be flagged')
+
+
+def record_flag(target, actor):
+    """
+    Count a new flag on `target`, a question, answer or comment.
+
+    The counter is moved with a single UPDATE. Only the flag that takes the
+    count to PENALTY_THRESHOLD matches the second UPDATE, which is limited
+    to an unpenalized counter one flag short of it, marks it penalized and
+    applies the penalty. A counter that moved between the two UPDATEs
+    matches neither and the flag is tried again, so the penalty fires once
+    per crossing however many flags race. Returns whether it was applied.
+    """
+    content_type = ContentType.objects.get_for_model(target)
+    counter = FlagCounter.objects.filter(content_type=content_type, object_id=target.pk)
+    crossing = {'count': PENALTY_THRESHOLD - 1, 'penalized': False}
+    # The open flags put the post (back) in the moderation queue
+    bump = {'count': F('count') + 1, 'open_count': F('open_count') + 1, 'first_flagged': Coalesce('first_flagged', Now())}
+    with transaction.atomic():
+        while True:
+            if counter.exclude(**crossing).update(**bump):
+                return False
+            if counter.filter(**crossing).update(**bump, penalized=True):
+                break
+            try:
+                with transaction.atomic():
+                    FlagCounter.objects.create(
+                        content_type=content_type, object_id=target.pk, count=1, penalized=PENALTY_THRESHOLD <= 1,
+                        open_count=1, first_flagged=timezone.now(),
+                    )
+            except IntegrityError:
+                # Created by a concurrent first flag, or the counter left the crossing between the two UPDATEs
+                continue
+            if PENALTY_THRESHOLD > 1:
+                return False
+            break
+        # The author is loaded lazily, target.user_id is enough for the ledger
+        reputation.award(target.user_id, PENALTY, 'FLAG_PENALTY', actor=actor, source=target)
+    return True
+
+
+def rebuild_counters():
+    """Recount FlagCounter from the Flag table, for flags created before the counters existed"""
+    counts = []
+    for model, field, extra in FLAG_TARGETS:
+        content_type = ContentType.objects.get_for_model(model)
+        rows = (
+            Flag.objects.filter(**{f'{field}__isnull': False}, **extra).values(field)
+            .annotate(n=Count('pk'), open=Count('pk', filter=Q(resolved=False)), first=Min('created', filter=Q(resolved=False)))
+        )
+        counts.extend(
+            FlagCounter(
+                content_type=content_type, object_id=row[field], count=row['n'], penalized=row['n'] >= PENALTY_THRESHOLD,
+                open_count=row['open'], first_flagged=row['first'],
+            )
+            for row in rows
+        )
+    with transaction.atomic():
+        FlagCounter.objects.all().delete()
+        FlagCounter.objects.bulk_create(counts, batch_size=500)
+    return len(counts)
+
+
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=Answer)
+@receiver(post_delete, sender=Comment)
+def _delete_counter(sender, instance, **kwargs):
+    FlagCounter.objects.filter(content_type=ContentType.objects.get_for_model(sender), object_id=instance.pk).delete()
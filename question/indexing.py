@@ -0,0 +1,322 @@
+import atexit
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import signals
+from django.utils.module_loading import import_string
+from django_elasticsearch_dsl.apps import DEDConfig
+from django_elasticsearch_dsl.registries import registry
+from django_elasticsearch_dsl.signals import BaseSignalProcessor
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'BACKEND': 'question.indexing.ElasticsearchBackend',
+    'FLUSH_INTERVAL': 1.0,  # seconds between scheduled flushes
+    'MAX_BATCH': 500,  # dirty rows that force an early flush, also the _bulk chunk size
+    'REFRESH': False,  # refresh policy passed to _bulk: False, True or 'wait_for'
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'SEARCH_INDEXING', {}).get(name, DEFAULTS[name])
+
+
+class ElasticsearchBackend:
+    """Sends actions to the cluster of the document through the _bulk API"""
+
+    def __init__(self, refresh=False):
+        self.refresh = refresh
+
+    def send(self, document, actions):
+        """Send the actions and return the ids of partial updates whose document does not exist"""
+        _, errors = document.bulk(actions, refresh=self.refresh, raise_on_error=False, chunk_size=get_setting('MAX_BATCH'))
+        missing = []
+        for error in errors:
+            if error.get('update', {}).get('status') == 404:
+                missing.append(error['update']['_id'])
+            # Deleting a document that was never indexed is not a failure
+            elif error.get('delete', {}).get('status') != 404:
+                logger.error('Search indexing failed: %s', error)
+        return missing
+
+
+class LocalBackend:
+    """In-memory stand-in for Elasticsearch, keeps the last source sent for each (index, id)"""
+
+    def __init__(self, refresh=False):
+        self.refresh = refresh
+        self.documents = {}
+        self.requests = []
+
+    def send(self, document, actions):
+        actions = list(actions)
+        self.requests.append(actions)
+        missing = []
+        for action in actions:
+            key = (action['_index'], str(action['_id']))
+            if action['_op_type'] == 'delete':
+                self.documents.pop(key, None)
+            elif action['_op_type'] == 'update':
+                if key in self.documents:
+                    self.documents[key].update(action['doc'])
+                else:
+                    missing.append(str(action['_id']))
+            else:
+                self.documents[key] = action['_source']
+        return missing
+
+
+class IndexQueue:
+    """
+    Coalescing queue of rows whose search documents are out of date.
+
+    Writers only mark (model, pk) as dirty, marking the same row again before
+    a flush costs nothing. A daemon thread renders the dirty rows and sends
+    them through the backend every FLUSH_INTERVAL seconds, or as soon as
+    MAX_BATCH rows are waiting.
+
+    A marker is 'index', 'delete' or a set of changed model fields. Rows that
+    only changed fields listed in the document's `partial_update_fields` are
+    sent as partial `update` actions carrying just the affected document
+    fields, instead of re-rendering the whole document.
+    """
+
+    def __init__(self):
+        self._dirty = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            self._backend = import_string(get_setting('BACKEND'))(refresh=get_setting('REFRESH'))
+        return self._backend
+
+    def mark(self, model, pk, action='index', fields=None):
+        """
+        Mark a row as dirty. With `fields` only those model fields changed.
+
+        A full index or delete replaces whatever was pending for the row,
+        changed fields are merged into a pending partial update and are
+        dropped when a full index or delete is already pending. Nothing is
+        marked while ELASTICSEARCH_DSL_AUTOSYNC is off or when no document
+        indexes the model.
+        """
+        if not DEDConfig.autosync_enabled() or not registry.get_documents(models=[model]):
+            return
+        with self._lock:
+            key = (model, pk)
+            current = self._dirty.get(key)
+            if fields is None or action == 'delete':
+                self._dirty[key] = action
+            elif current is None:
+                self._dirty[key] = frozenset(fields)
+            elif isinstance(current, frozenset):
+                self._dirty[key] = current | frozenset(fields)
+            full = len(self._dirty) >= get_setting('MAX_BATCH')
+        self._ensure_flusher()
+        if full:
+            self._wakeup.set()
+
+    def pending(self):
+        with self._lock:
+            return dict(self._dirty)
+
+    def flush(self):
+        """Send every dirty row to the backend and return how many rows were flushed"""
+        with self._lock:
+            batch, self._dirty = self._dirty, {}
+        if not batch:
+            return 0
+
+        by_model = defaultdict(dict)
+        for (model, pk), action in batch.items():
+            by_model[model][pk] = action
+        try:
+            for model, markers in by_model.items():
+                self._send(model, markers)
+        except Exception:
+            # Requeue without overwriting rows marked again in the meantime
+            with self._lock:
+                for key, action in batch.items():
+                    self._dirty.setdefault(key, action)
+            raise
+        return len(batch)
+
+    def _send(self, model, markers):
+        to_index = [pk for pk, action in markers.items() if action == 'index']
+        to_delete = [pk for pk, action in markers.items() if action == 'delete']
+        partial = {pk: fields for pk, fields in markers.items() if isinstance(fields, frozenset)}
+
+        for document_class in registry.get_documents(models=[model]):
+            if document_class.django.ignore_signals:
+                continue
+            document = document_class()
+            actions = []
+            found = set()
+            if to_index:
+                for instance in document.get_queryset().filter(pk__in=to_index):
+                    found.add(instance.pk)
+                    if document.should_index_object(instance):
+                        actions.append(document._prepare_action(instance, 'index'))
+            # Rows deleted before the flush are removed from the index as well
+            for pk in to_delete + [pk for pk in to_index if pk not in found]:
+                actions.append({'_op_type': 'delete', '_index': document._index._name, '_id': pk})
+            if partial:
+                actions.extend(self._partial_actions(document, partial))
+            if actions:
+                missing = self.backend.send(document, actions) or []
+                # A partial update cannot create a document, index those rows in full instead
+                for pk in missing:
+                    self.mark(model, model._meta.pk.to_python(pk))
+
+    def _partial_actions(self, document, partial):
+        sources = getattr(document, 'partial_update_fields', {})
+        wanted = {}
+        for pk, fields in partial.items():
+            names = {name for field in fields for name in sources.get(field, ())}
+            if names:
+                wanted[pk] = names
+        if not wanted:
+            return []
+
+        preparers = {name: prepare for name, _, prepare in document._prepared_fields}
+        instances = document.django.model._default_manager.filter(pk__in=wanted).only(*sources)
+        return [
+            {
+                '_op_type': 'update',
+                '_index': document._index._name,
+                '_id': document.generate_id(instance),
+                'doc': {name: preparers[name](instance) for name in wanted[instance.pk]},
+            }
+            for instance in instances
+        ]
+
+    def _ensure_flusher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='search-index-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(get_setting('FLUSH_INTERVAL'))
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Flushing the search index queue failed')
+                time.sleep(1)
+            finally:
+                close_old_connections()
+
+
+index_queue = IndexQueue()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        index_queue.flush()
+    except Exception:
+        logger.exception('Flushing the search index queue at exit failed')
+
+
+class QueuedSignalProcessor(BaseSignalProcessor):
+    """
+    Replaces the real-time auto-sync of django_elasticsearch_dsl.
+
+    Saves, deletes and m2m changes of indexed models only mark the row in the
+    index queue, so no write request waits on Elasticsearch. For models whose
+    documents declare `partial_update_fields`, the field values are
+    snapshotted when an instance is loaded so a save that only touched those
+    fields is queued as a partial update, and a save that changed nothing is
+    not queued at all.
+    """
+
+    def setup(self):
+        self._partial_sources = {}
+        for document in registry.get_documents():
+            sources = getattr(document, 'partial_update_fields', None)
+            if sources:
+                self._partial_sources.setdefault(document.django.model, set()).update(sources)
+        for model in self._partial_sources:
+            signals.post_init.connect(self.handle_init, sender=model)
+
+        signals.post_save.connect(self.handle_save)
+        # A post_delete receiver without a sender would keep Django from fast-deleting any model
+        self._models = registry.get_models()
+        for model in self._models:
+            signals.post_delete.connect(self.handle_delete, sender=model)
+        signals.m2m_changed.connect(self.handle_m2m_changed)
+
+    def teardown(self):
+        for model in self._partial_sources:
+            signals.post_init.disconnect(self.handle_init, sender=model)
+        signals.post_save.disconnect(self.handle_save)
+        for model in self._models:
+            signals.post_delete.disconnect(self.handle_delete, sender=model)
+        signals.m2m_changed.disconnect(self.handle_m2m_changed)
+
+    def handle_init(self, sender, instance, **kwargs):
+        instance._search_snapshot = _snapshot(instance)
+
+    def handle_save(self, sender, instance, created=False, update_fields=None, **kwargs):
+        if sender not in self._partial_sources or created:
+            self._mark(sender, instance.pk)
+            return
+
+        snapshot = getattr(instance, '_search_snapshot', None)
+        instance._search_snapshot = _snapshot(instance)
+        if update_fields is not None:
+            changed = set(update_fields)
+        elif snapshot is not None:
+            changed = {name for name, value in instance._search_snapshot.items() if snapshot.get(name, _DEFERRED) != value}
+        else:
+            changed = None
+        if changed is not None:
+            changed -= _auto_now_fields(sender)
+
+        if changed is None or not changed <= self._partial_sources[sender]:
+            self._mark(sender, instance.pk)
+        elif changed:
+            self._mark(sender, instance.pk, fields=changed)
+
+    def handle_delete(self, sender, instance, **kwargs):
+        self._mark(sender, instance.pk, 'delete')
+
+    def handle_m2m_changed(self, sender, instance, action, reverse=False, model=None, pk_set=None, **kwargs):
+        if action not in ('post_add', 'post_remove', 'post_clear'):
+            return
+        if not reverse:
+            self._mark(type(instance), instance.pk)
+        elif pk_set:
+            # Changed from the other side, e.g. tag.questions.add(...)
+            for pk in pk_set:
+                self._mark(model, pk)
+
+    def _mark(self, model, pk, action='index', fields=None):
+        index_queue.mark(model, pk, action, fields=fields)
+
+
+_DEFERRED = object()
+
+
+def _snapshot(instance):
+    # Deferred fields are not in __dict__ and compare as changed once loaded
+    return {field.attname: instance.__dict__.get(field.attname, _DEFERRED) for field in instance._meta.concrete_fields}
+
+
+def _auto_now_fields(model):
+    return {field.attname for field in model._meta.concrete_fields if getattr(field, 'auto_now', False)}
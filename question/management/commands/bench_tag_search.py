@@ -0,0 +1,61 @@
+import random
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+
+from question.documents import TagDocument
+from question.models import Tag
+from question.tag_index import tag_index
+
+
+class Command(BaseCommand):
+    help = 'Time tag autocomplete through the in-memory prefix index and through Elasticsearch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=1000)
+        parser.add_argument('--tags', type=int, default=0, help='Create this many synthetic tags for the run')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        prefix = f'bench{uuid.uuid4().hex[:6]}'
+        if options['tags']:
+            Tag.objects.bulk_create([Tag(name=f'{prefix}-{i:06d}') for i in range(options['tags'])])
+        try:
+            names = list(Tag.objects.values_list('name', flat=True))
+            if not names:
+                self.stderr.write('No tags to search, pass --tags to create some')
+                return
+            # What a client sends while the user types: the first 1 to 4 characters of a tag
+            queries = [name[:rng.randint(1, min(4, len(name)))] for name in rng.choices(names, k=options['queries'])]
+            self.stdout.write(f'{len(names)} tags, {len(queries)} prefix queries')
+
+            started = time.perf_counter()
+            tag_index.load()
+            self.stdout.write(f'{"index load":>14}: {(time.perf_counter() - started) * 1e3:.1f} ms')
+            self._report('prefix index', queries, tag_index.search)
+
+            def elasticsearch(query):
+                return TagDocument.search(index='tags').query(
+                    'multi_match', query=query, fields=['name', 'description'], type='best_fields', fuzziness='AUTO',
+                ).execute()
+
+            try:
+                self._report('elasticsearch', queries[:100], elasticsearch)
+            except Exception as e:
+                self.stderr.write(f'{"elasticsearch":>14}: unavailable ({e.__class__.__name__})')
+        finally:
+            if options['tags']:
+                Tag.objects.filter(name__startswith=prefix).delete()
+
+    def _report(self, label, queries, search):
+        timings = []
+        for query in queries:
+            started = time.perf_counter()
+            search(query)
+            timings.append((time.perf_counter() - started) * 1e6)
+        timings.sort()
+        p99 = timings[max(int(len(timings) * 0.99) - 1, 0)]
+        self.stdout.write(f'{label:>14}: mean {statistics.mean(timings):9.1f} us, p50 {statistics.median(timings):9.1f} us, p99 {p99:9.1f} us')
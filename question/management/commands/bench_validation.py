@@ -0,0 +1,68 @@
+import random
+import re
+import statistics
+import time
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from profanity_check import predict
+
+from question.content_management.profanity import classifier
+from question.content_management.validators import scan_fields, CONTACT_RULES, MALICIOUS_RULES
+
+
+WORDS = ('django query index cache thread python model view signal request response database '
+         'migration template form field queryset transaction lock cursor page search tag').split()
+
+
+class Command(BaseCommand):
+    help = 'Time submission validation per request: one scan of all fields against the old per-field calls.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--body-words', type=int, default=300, help='Words in each generated body')
+        parser.add_argument('--tags', type=int, default=5)
+        parser.add_argument('--no-profanity', action='store_true', help='Leave the profanity model out of the timings')
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        user = SimpleNamespace(is_superuser=False)
+        profanity = not options['no_profanity']
+        submissions = [
+            {
+                'title': ' '.join(rng.choices(WORDS, k=10)),
+                'body': ' '.join(rng.choices(WORDS, k=options['body_words'])),
+                'tags': rng.sample(WORDS, options['tags']),
+            }
+            for _ in range(options['requests'])
+        ]
+
+        # What the views used to do: both validators called on each field, compiling every pattern per call
+        def per_field(fields):
+            for name, value in fields.items():
+                for text in value if isinstance(value, list) else [value]:
+                    if profanity and predict([text])[0] == 1:
+                        return name
+                    for _, pattern, _ in CONTACT_RULES + MALICIOUS_RULES:
+                        if re.compile(pattern).search(text):
+                            return name
+
+        self._report('per-field calls', submissions, per_field)
+        classifier.clear()
+        self._report('single scan', submissions, lambda fields: scan_fields(fields, user, profanity=profanity))
+        if profanity:
+            # Same submissions again, as when an unchanged body is resubmitted
+            self._report('cached scan', submissions, lambda fields: scan_fields(fields, user, profanity=profanity))
+            self.stdout.write(f'profanity cache: {classifier.hits} hits, {classifier.misses} misses')
+
+    def _report(self, label, submissions, validate):
+        timings = []
+        for fields in submissions:
+            started = time.perf_counter()
+            validate(fields)
+            timings.append((time.perf_counter() - started) * 1e6)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        self.stdout.write(f'{label:>16}: mean {statistics.mean(timings):8.1f} us, p50 {statistics.median(timings):8.1f} us, p95 {p95:8.1f} us per request')
@@ -0,0 +1,101 @@
+import random
+import threading
+import time
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from user.models import Profile
+from user.reputation import materialize
+from question.models import Question, Answer, Comment, Vote
+from question.votes import cast_vote, VoteError, UPVOTE, DOWNVOTE, REPUTATION_RULES, TARGET_TYPES
+
+
+class Command(BaseCommand):
+    help = 'Hammer the vote service from several threads, check the counters and report votes/sec.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--voters', type=int, default=40, help='Users voting on the same targets')
+        parser.add_argument('--votes', type=int, default=50, help='Votes cast by each thread')
+        parser.add_argument('--seed', type=int, default=None)
+        parser.add_argument('--keep', action='store_true', help='Keep the benchmark rows afterwards')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        prefix = f'bench-{uuid.uuid4().hex[:8]}'
+
+        author = User.objects.create_user(username=f'{prefix}-author')
+        voters = [User.objects.create_user(username=f'{prefix}-voter-{i}') for i in range(options['voters'])]
+        question = Question.objects.create(user=author, title=prefix, body=prefix)
+        answer = Answer.objects.create(user=author, question=question, body=prefix)
+        comment = Comment.objects.create(user=author, question=question, answer=answer, content=prefix)
+        targets = [(Question, question.pk), (Answer, answer.pk), (Comment, comment.pk)]
+        start_reputation = dict(Profile.objects.filter(user__username__startswith=prefix).values_list('user_id', 'reputation'))
+
+        expected = {user_id: 0 for user_id in start_reputation}
+        expected_lock = threading.Lock()
+        errors = []
+        cast = [0]
+
+        def worker():
+            local = {}
+            try:
+                for _ in range(options['votes']):
+                    voter = rng.choice(voters)
+                    model, pk = rng.choice(targets)
+                    vote_type = rng.choice([UPVOTE, DOWNVOTE])
+                    try:
+                        result = cast_vote(voter, model, pk, vote_type)
+                    except VoteError:
+                        continue
+                    kind = 'switch' if result['message'] == 'Vote updated successfully' else 'new'
+                    author_delta, voter_delta = REPUTATION_RULES[(model, vote_type)][kind]
+                    local[author.id] = local.get(author.id, 0) + author_delta
+                    local[voter.id] = local.get(voter.id, 0) + voter_delta
+                    local['cast'] = local.get('cast', 0) + 1
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+                with expected_lock:
+                    cast[0] += local.pop('cast', 0)
+                    for user_id, delta in local.items():
+                        expected[user_id] += delta
+
+        threads = [threading.Thread(target=worker) for _ in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        try:
+            if errors:
+                raise CommandError(f'{len(errors)} worker(s) failed, first error: {errors[0]!r}')
+
+            mismatches = []
+            for model, pk in targets:
+                row = model.objects.values('upvotes', 'downvotes').get(pk=pk)
+                votes = Vote.objects.filter(target_type=TARGET_TYPES[model], target_id=pk)
+                ups = votes.filter(value=Vote.UPVOTE).count()
+                downs = votes.filter(value=Vote.DOWNVOTE).count()
+                if (row['upvotes'], row['downvotes']) != (ups, downs):
+                    mismatches.append(f'{model.__name__} counters {row} but votes are {ups} up / {downs} down')
+
+            materialize()
+            reputation = dict(Profile.objects.filter(user_id__in=expected).values_list('user_id', 'reputation'))
+            for user_id, delta in expected.items():
+                if reputation[user_id] != start_reputation[user_id] + delta:
+                    mismatches.append(f'Profile of user {user_id} is {reputation[user_id]}, expected {start_reputation[user_id] + delta}')
+
+            self.stdout.write(f'{cast[0]} votes applied by {options["threads"]} threads in {elapsed:.2f}s ({cast[0] / elapsed:.1f} votes/sec)')
+            if mismatches:
+                raise CommandError('Counters drifted:\n' + '\n'.join(mismatches))
+            self.stdout.write(self.style.SUCCESS('Vote counters and reputation are consistent'))
+        finally:
+            if not options['keep']:
+                User.objects.filter(username__startswith=prefix).delete()
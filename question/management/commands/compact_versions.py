@@ -0,0 +1,111 @@
+import os
+from datetime import timedelta
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+from reversion.models import Revision, Version
+
+from question.models import Question, Answer, Comment
+
+
+MODELS = {'question': Question, 'answer': Answer, 'comment': Comment}
+
+
+def retained(versions, keep_last, daily_cutoff):
+    """pks of the versions to keep out of the versions of one object, oldest first"""
+    keep = {versions[0].pk}  # the creation snapshot
+    if keep_last:
+        keep.update(version.pk for version in versions[-keep_last:])
+    newest_of_day = {}
+    for version in versions:
+        created = version.revision.date_created
+        if created >= daily_cutoff:
+            keep.add(version.pk)
+        else:
+            newest_of_day[created.date()] = version.pk
+    keep.update(newest_of_day.values())
+    return keep
+
+
+class Command(BaseCommand):
+    help = 'Delete old versions of questions, answers and comments by retention rules.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('models', nargs='*', help=f"Models to compact: {', '.join(MODELS)}, all of them by default")
+        parser.add_argument('--keep-last', type=int, default=10, help='Newest versions of each object always kept')
+        parser.add_argument('--daily-after', type=int, default=30, help='Versions older than this many days are thinned to the newest of each day')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Objects compacted per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Report what would be reclaimed and roll back')
+        parser.add_argument('--vacuum', action='store_true', help='VACUUM the SQLite database afterwards to give the space back to the filesystem')
+
+    def handle(self, *args, **options):
+        if options['keep_last'] < 0 or options['daily_after'] < 0 or options['chunk_size'] < 1:
+            raise CommandError('--keep-last and --daily-after cannot be negative, --chunk-size must be positive')
+        unknown = set(options['models']) - set(MODELS)
+        if unknown:
+            raise CommandError(f"Unknown models: {', '.join(sorted(unknown))}")
+        daily_cutoff = timezone.now() - timedelta(days=options['daily_after'])
+        totals = {'objects': 0, 'deleted': 0, 'bytes': 0}
+
+        for name in options['models'] or list(MODELS):
+            model = MODELS[name]
+            content_type = ContentType.objects.get_for_model(model)
+            # Objects with only the creation snapshot and the last N versions have nothing to delete
+            least = options['keep_last'] + 2
+            candidates = (
+                Version.objects.filter(content_type=content_type).values('object_id')
+                .annotate(versions=Count('pk')).filter(versions__gte=least).order_by('object_id')
+            )
+            last = None
+            while True:
+                page = candidates.filter(object_id__gt=last) if last is not None else candidates
+                object_ids = [row['object_id'] for row in page[:options['chunk_size']]]
+                if not object_ids:
+                    break
+                last = object_ids[-1]
+                with transaction.atomic():
+                    for object_id in object_ids:
+                        deleted, reclaimed = self._compact(model, content_type, object_id, daily_cutoff, options)
+                        totals['objects'] += 1 if deleted or reclaimed else 0
+                        totals['deleted'] += deleted
+                        totals['bytes'] += reclaimed
+                    if options['dry_run']:
+                        transaction.set_rollback(True)
+                self.stdout.write(f'{name}: compacted up to object {last}')
+
+        verb = 'Would reclaim' if options['dry_run'] else 'Reclaimed'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {totals['bytes']:,} bytes of version data: {totals['deleted']} versions deleted across {totals['objects']} objects"
+        ))
+        if options['vacuum'] and not options['dry_run']:
+            self._vacuum()
+
+    def _compact(self, model, content_type, object_id, daily_cutoff, options):
+        versions = list(
+            Version.objects.filter(content_type=content_type, object_id=object_id)
+            .select_related('revision').order_by('revision__date_created', 'pk')
+        )
+        keep = retained(versions, options['keep_last'], daily_cutoff)
+        drop = [version for version in versions if version.pk not in keep]
+        if not drop:
+            return 0, 0
+
+        reclaimed = sum(len(version.serialized_data) + len(version.object_repr) for version in drop)
+        revisions = {version.revision_id for version in drop}
+        Version.objects.filter(pk__in=[version.pk for version in drop]).delete()
+        Revision.objects.filter(pk__in=revisions, version__isnull=True).delete()
+        return len(drop), reclaimed
+
+    def _vacuum(self):
+        if connection.vendor != 'sqlite':
+            self.stderr.write('--vacuum only applies to SQLite')
+            return
+        path = connection.settings_dict['NAME']
+        before = os.path.getsize(path)
+        with connection.cursor() as cursor:
+            cursor.execute('VACUUM')
+        after = os.path.getsize(path)
+        self.stdout.write(f'VACUUM shrank {path} from {before:,} to {after:,} bytes')
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from question.view_counter import view_counter
+
+
+class Command(BaseCommand):
+    help = 'Write the question views pending in the cache, recorded by any worker process, to the database.'
+
+    def handle(self, *args, **options):
+        pending = sum(view_counter.pending().values())
+        updated = view_counter.flush()
+        self.stdout.write(self.style.SUCCESS(f'Flushed {pending} views across {updated} questions'))
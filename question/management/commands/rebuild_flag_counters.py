@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from question.flags import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Recount the per-post flag counters from the Flag table.'
+
+    def handle(self, *args, **options):
+        count = rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} flag counters'))
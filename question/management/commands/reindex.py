@@ -0,0 +1,98 @@
+import json
+import os
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django_elasticsearch_dsl.registries import registry
+from elasticsearch.helpers import parallel_bulk
+
+
+class Command(BaseCommand):
+    help = 'Stream the questions, answers, comments and tags indices from the database with parallel bulk workers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('indices', nargs='*', help='Indices to rebuild, all of them by default')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Rows fetched, rendered and sent per bulk request')
+        parser.add_argument('--workers', type=int, default=4, help='Parallel bulk threads')
+        parser.add_argument('--checkpoint', default=str(settings.BASE_DIR / '.reindex_checkpoint.json'),
+                            help='File recording the last indexed pk of each index')
+        parser.add_argument('--resume', action='store_true', help='Continue after the pk recorded in the checkpoint')
+        parser.add_argument('--recreate', action='store_true', help='Drop and create each index before filling it')
+
+    def handle(self, *args, **options):
+        documents = {document._index._name: document for document in registry.get_documents()}
+        names = options['indices'] or sorted(documents)
+        unknown = set(names) - set(documents)
+        if unknown:
+            raise CommandError(f"Unknown indices: {', '.join(sorted(unknown))}")
+
+        checkpoint = self._load_checkpoint(options['checkpoint']) if options['resume'] else {}
+        total_docs, started = 0, time.perf_counter()
+        for name in names:
+            if options['recreate']:
+                documents[name]._index.delete(ignore_unavailable=True)
+                documents[name]._index.create()
+                checkpoint.pop(name, None)
+            total_docs += self._reindex(name, documents[name](), checkpoint, options)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total_docs} documents in {elapsed:.1f}s ({total_docs / max(elapsed, 1e-9):.0f} docs/sec)'))
+
+    def _reindex(self, name, document, checkpoint, options):
+        chunk_size = options['chunk_size']
+        queryset = document.get_queryset().order_by('pk')
+        if name in checkpoint:
+            queryset = queryset.filter(pk__gt=checkpoint[name])
+            self.stdout.write(f'{name}: resuming after pk {checkpoint[name]}')
+
+        # pks of the actions sent but not yet acknowledged, in bulk order
+        in_flight = deque()
+
+        def actions():
+            # iterator() streams rows with a server-side cursor where the database has one,
+            # prefetch_related('tags') is then run once per chunk instead of once per row
+            for instance in queryset.iterator(chunk_size=chunk_size):
+                if document.should_index_object(instance):
+                    in_flight.append(instance.pk)
+                    yield document._prepare_action(instance, 'index')
+
+        done = failed = 0
+        started = time.perf_counter()
+        results = parallel_bulk(
+            document._get_connection(), actions(),
+            thread_count=options['workers'], chunk_size=chunk_size, raise_on_error=False,
+        )
+        # parallel_bulk yields results in the order the actions were produced
+        for ok, info in results:
+            pk = in_flight.popleft()
+            done += 1
+            if not ok:
+                failed += 1
+                self.stderr.write(f'{name}: failed to index pk {pk}: {info}')
+            if done % chunk_size == 0:
+                checkpoint[name] = pk
+                self._save_checkpoint(options['checkpoint'], checkpoint)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'{name}: {done} documents ({done / elapsed:.0f} docs/sec)')
+
+        document._index.refresh()
+        checkpoint.pop(name, None)
+        self._save_checkpoint(options['checkpoint'], checkpoint)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{name}: {done} documents, {failed} failed in {elapsed:.1f}s ({done / max(elapsed, 1e-9):.0f} docs/sec)')
+        return done - failed
+
+    def _load_checkpoint(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _save_checkpoint(self, path, checkpoint):
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp, path)
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.1 on 2026-10-17 04:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('question', '0001_initial'),
+        ('user', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='answer',
+            index=models.Index(fields=['user', '-created', '-id'], name='answer_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['user', '-created', '-id'], name='comment_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='flag',
+            index=models.Index(condition=models.Q(('question__isnull', False)), fields=['user', 'question'], name='flag_user_question'),
+        ),
+        migrations.AddIndex(
+            model_name='flag',
+            index=models.Index(condition=models.Q(('answer__isnull', False)), fields=['user', 'answer'], name='flag_user_answer'),
+        ),
+        migrations.AddIndex(
+            model_name='flag',
+            index=models.Index(condition=models.Q(('comment__isnull', False)), fields=['user', 'comment'], name='flag_user_comment'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['user', '-created', '-id'], name='question_user_created'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(condition=models.Q(('answer__isnull', False)), fields=['user', 'answer', 'vote_type'], name='vote_user_answer'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(condition=models.Q(('comment__isnull', False)), fields=['user', 'comment', 'vote_type'], name='vote_user_comment'),
+        ),
+    ]
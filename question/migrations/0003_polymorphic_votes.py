@@ -0,0 +1,155 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, F, Max, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+
+QUESTION, ANSWER, COMMENT = 1, 2, 3
+TARGETS = {QUESTION: 'Question', ANSWER: 'Answer', COMMENT: 'Comment'}
+
+
+def forwards(apps, schema_editor):
+    """
+    Move each vote onto (target_type, target_id, value).
+
+    The old unique_together could not stop two votes of one user on one post,
+    a vote on each side or rows differing only by NULLs. One UPDATE fills in
+    the new columns from the most specific post the vote names, the way it
+    was cast. The newest vote of each user and post is kept, one DELETE with
+    a grouped subquery drops the others, and the vote counters of the posts
+    involved are recounted from the votes that remain.
+    """
+    Vote = apps.get_model('question', 'Vote')
+    Vote.objects.filter(question__isnull=True, answer__isnull=True, comment__isnull=True).delete()
+    Vote.objects.update(
+        target_type=Case(
+            When(comment__isnull=False, then=Value(COMMENT)),
+            When(answer__isnull=False, then=Value(ANSWER)),
+            default=Value(QUESTION),
+        ),
+        target_id=Coalesce('comment_id', 'answer_id', 'question_id'),
+        value=Case(When(vote_type='UPVOTE', then=Value(1)), default=Value(-1)),
+    )
+
+    # Only posts with duplicates are recounted, so only their ids are read
+    groups = Vote.objects.values('user_id', 'target_type', 'target_id').annotate(n=Count('id'))
+    touched = {
+        target_type: list(groups.filter(target_type=target_type, n__gt=1).values_list('target_id', flat=True).distinct())
+        for target_type in TARGETS
+    }
+    Vote.objects.exclude(id__in=groups.annotate(keep=Max('id')).values('keep')).delete()
+
+    for target_type, ids in touched.items():
+        if not ids:
+            continue
+        votes = Vote.objects.filter(target_type=target_type, target_id=OuterRef('pk')).values('target_id')
+        counts = {
+            field: Coalesce(Subquery(votes.filter(value=value).annotate(n=Count('id')).values('n')), 0)
+            for field, value in (('upvotes', 1), ('downvotes', -1))
+        }
+        apps.get_model('question', TARGETS[target_type]).objects.filter(id__in=ids).update(**counts)
+
+
+def backwards(apps, schema_editor):
+    Vote = apps.get_model('question', 'Vote')
+    Vote.objects.update(
+        vote_type=Case(When(value=1, then=Value('UPVOTE')), default=Value('DOWNVOTE')),
+        **{
+            field: Case(When(target_type=target_type, then=F('target_id')), default=None)
+            for target_type, field in ((QUESTION, 'question_id'), (ANSWER, 'answer_id'), (COMMENT, 'comment_id'))
+        },
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('question', '0002_hot_lookup_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='vote',
+            name='vote_user_answer',
+        ),
+        migrations.RemoveIndex(
+            model_name='vote',
+            name='vote_user_comment',
+        ),
+        migrations.AlterUniqueTogether(
+            name='vote',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='vote',
+            name='target_type',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Question'), (2, 'Answer'), (3, 'Comment')], null=True),
+        ),
+        migrations.AddField(
+            model_name='vote',
+            name='target_id',
+            field=models.PositiveBigIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='vote',
+            name='value',
+            field=models.SmallIntegerField(choices=[(1, 'Upvote'), (-1, 'Downvote')], null=True),
+        ),
+        # Removed below, nullable so that the reverse can add it back before backwards() fills it in
+        migrations.AlterField(
+            model_name='vote',
+            name='vote_type',
+            field=models.CharField(choices=[('UPVOTE', 'Upvote'), ('DOWNVOTE', 'Downvote')], max_length=10, null=True),
+        ),
+        migrations.RunPython(forwards, backwards),
+        migrations.RemoveField(
+            model_name='vote',
+            name='question',
+        ),
+        migrations.RemoveField(
+            model_name='vote',
+            name='answer',
+        ),
+        migrations.RemoveField(
+            model_name='vote',
+            name='comment',
+        ),
+        migrations.RemoveField(
+            model_name='vote',
+            name='vote_type',
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='target_type',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Question'), (2, 'Answer'), (3, 'Comment')]),
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='target_id',
+            field=models.PositiveBigIntegerField(),
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='value',
+            field=models.SmallIntegerField(choices=[(1, 'Upvote'), (-1, 'Downvote')]),
+        ),
+        migrations.AlterField(
+            model_name='vote',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(fields=('user', 'target_type', 'target_id'), name='unique_vote'),
+        ),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.CheckConstraint(condition=models.Q(('value__in', [1, -1])), name='vote_value'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['target_type', 'target_id', 'value'], name='vote_target'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('question', '0003_polymorphic_votes'),
+    ]
+
+    operations = [
+        # The table Django created for Question.tags becomes an explicit model, nothing changes in the database
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='QuestionTag',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='question.question')),
+                        ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='question.tag')),
+                    ],
+                    options={
+                        'db_table': 'question_question_tags',
+                        'unique_together': {('question', 'tag')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='question',
+                    name='tags',
+                    field=models.ManyToManyField(related_name='questions', through='question.QuestionTag', to='question.tag'),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='questiontag',
+            index=models.Index(fields=['tag', '-question'], name='question_tag_newest'),
+        ),
+        # Covered by question_tag_newest
+        migrations.AlterField(
+            model_name='questiontag',
+            name='tag',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='question.tag'),
+        ),
+    ]
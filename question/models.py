@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
 from user.models import Profile
 
 # Create your models here.
@@ -16,14 +17,28 @@ class Question(TimeStampModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='questions')
     title = models.CharField(max_length=255)
     body = models.TextField()
-    tags = models.ManyToManyField('Tag', related_name='questions')
+    tags = models.ManyToManyField('Tag', related_name='questions', through='QuestionTag')
     views_count = models.IntegerField(default=0)
     upvotes = models.PositiveIntegerField(default=0)
     downvotes = models.PositiveIntegerField(default=0)
 
+    # Weights of the popularity score indexed with the question
+    UPVOTE_WEIGHT = 5
+    VIEW_WEIGHT = 0.1
+
+    class Meta:
+        indexes = [
+            # Keyset pages of a user's own questions, see question.pagination
+            models.Index(fields=['user', '-created', '-id'], name='question_user_created'),
+        ]
+
     def __str__(self):
         return self.title
 
+    @property
+    def popularity(self):
+        return (self.upvotes * self.UPVOTE_WEIGHT) + (self.views_count * self.VIEW_WEIGHT)
+
 class Answer(TimeStampModel):
     id = models.BigAutoField(primary_key=True)
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='answers')
@@ -33,6 +48,11 @@ class Answer(TimeStampModel):
     upvotes = models.PositiveIntegerField(default=0)
     downvotes = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created', '-id'], name='answer_user_created'),
+        ]
+
     def __str__(self):
         return f'Answer to {self.question.title}'
 
@@ -45,6 +65,11 @@ class Comment(TimeStampModel):
     upvotes = models.PositiveIntegerField(default=0)
     downvotes = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created', '-id'], name='comment_user_created'),
+        ]
+
     def __str__(self):
         return f'Comment by {self.user.email}'
 
@@ -55,7 +80,23 @@ class Tag(TimeStampModel):
 
     def __str__(self):
         return self.name
-    
+
+
+class QuestionTag(models.Model):
+    """The link table of Question.tags, kept as the question_question_tags table Django created for it"""
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, db_index=False)
+
+    class Meta:
+        db_table = 'question_question_tags'
+        unique_together = ('question', 'tag')
+        indexes = [
+            # The questions of a tag newest first, see TagsDetailView
+            models.Index(fields=['tag', '-question'], name='question_tag_newest'),
+        ]
+
+    def __str__(self):
+        return f'{self.tag_id} on question {self.question_id}'
 
 
 class Flag(TimeStampModel):
@@ -75,20 +116,76 @@ class Flag(TimeStampModel):
     description = models.TextField(null=True, blank=True)  # Additional information about the flag
     resolved = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # "Already flagged" checks, partial since a flag only names one or two of the targets
+            models.Index(fields=['user', 'question'], name='flag_user_question', condition=models.Q(question__isnull=False)),
+            models.Index(fields=['user', 'answer'], name='flag_user_answer', condition=models.Q(answer__isnull=False)),
+            models.Index(fields=['user', 'comment'], name='flag_user_comment', condition=models.Q(comment__isnull=False)),
+        ]
+
     def __str__(self):
         return f'Flag by {self.user.email} on {self.reason}'
     
+class FlagCounter(models.Model):
+    """Number of flags raised on one question, answer or comment, maintained by question.flags"""
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    count = models.PositiveIntegerField(default=0)
+    penalized = models.BooleanField(default=False)  # the flag penalty was applied for the current crossing
+    open_count = models.PositiveIntegerField(default=0)  # flags not yet resolved or dismissed by a moderator
+    first_flagged = models.DateTimeField(null=True, blank=True)  # oldest open flag, None once the queue entry is cleared
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id'], name='unique_flag_counter'),
+        ]
+        indexes = [
+            # The moderation queue, most flagged and then longest waiting first
+            models.Index(fields=['-open_count', 'first_flagged', 'id'], name='flag_queue', condition=models.Q(open_count__gt=0)),
+        ]
+
+    def __str__(self):
+        return f'{self.count} flags on {self.content_type.model} {self.object_id}'
+
+
 class Vote(models.Model):
-    VOTE_TYPE_CHOICES = [
-        ('UPVOTE', 'Upvote'),
-        ('DOWNVOTE', 'Downvote'),
+    """
+    One vote of a user on a question, answer or comment, see question.votes.
+
+    The target is stored as a (target_type, target_id) pair instead of one
+    nullable foreign key per kind of post, so the unique constraint holds in
+    SQL and every lookup probes the same index. Votes of a deleted post are
+    removed by the post_delete receiver of question.votes.
+    """
+    QUESTION, ANSWER, COMMENT = 1, 2, 3
+    TARGET_TYPES = [
+        (QUESTION, 'Question'),
+        (ANSWER, 'Answer'),
+        (COMMENT, 'Comment'),
+    ]
+    UPVOTE, DOWNVOTE = 1, -1
+    VALUES = [
+        (UPVOTE, 'Upvote'),
+        (DOWNVOTE, 'Downvote'),
     ]
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
-    question = models.ForeignKey(Question, on_delete=models.CASCADE, null=True, blank=True, related_name='votes')
-    answer = models.ForeignKey(Answer, on_delete=models.CASCADE, null=True, blank=True, related_name='votes')
-    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, null=True, blank=True, related_name='votes')
-    vote_type = models.CharField(max_length=10, choices=VOTE_TYPE_CHOICES)
+    # Not indexed on its own, the unique constraint leads with the user
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
+    target_type = models.PositiveSmallIntegerField(choices=TARGET_TYPES)
+    target_id = models.PositiveBigIntegerField()
+    value = models.SmallIntegerField(choices=VALUES)
 
     class Meta:
-        unique_together = ('user', 'question', 'answer', 'comment', 'vote_type')
\ No newline at end of file
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'target_type', 'target_id'], name='unique_vote'),
+            models.CheckConstraint(condition=models.Q(value__in=[1, -1]), name='vote_value'),
+        ]
+        indexes = [
+            # Covers counting the votes of a post, also used to remove them
+            models.Index(fields=['target_type', 'target_id', 'value'], name='vote_target'),
+        ]
+
+    def __str__(self):
+        return f'{self.get_value_display()} by {self.user_id} on {self.get_target_type_display()} {self.target_id}'
+
@@ -0,0 +1,197 @@
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import F, Q, Case, When, Value, Count
+from django.utils.dateparse import parse_datetime
+
+from .models import Question, Answer, Comment, Flag, FlagCounter, QuestionTag, Vote
+from .flags import flags_on, PENALTY_THRESHOLD
+from .votes import TARGET_TYPES
+from .indexing import index_queue
+from .detail_cache import detail_cache
+from .pagination import encode_cursor, decode_cursor
+
+
+CONTENT_TYPES = {'question': Question, 'answer': Answer, 'comment': Comment}
+EXCERPT_LENGTH = 200
+
+
+def queue_page(cursor=None, page_size=10):
+    """
+    One page of the moderation queue, most flagged and then longest waiting first.
+
+    The counters are read in the order of the partial `flag_queue` index with
+    keyset pagination on (open_count, first_flagged, id). The flagged posts
+    and the open flags per reason are then loaded with one query per content
+    type on the page, however many items it holds. Returns the items and the
+    cursor of the next page, None on the last page. Raises ValueError for a
+    malformed cursor.
+    """
+    counters = FlagCounter.objects.filter(open_count__gt=0).order_by('-open_count', 'first_flagged', 'id')
+    if cursor:
+        values = decode_cursor(cursor)
+        first = parse_datetime(values[1]) if len(values) == 3 and isinstance(values[1], str) else None
+        if first is None or not isinstance(values[0], int) or not isinstance(values[2], int):
+            raise ValueError('Invalid cursor')
+        counters = counters.filter(
+            Q(open_count__lt=values[0])
+            | Q(open_count=values[0], first_flagged__gt=first)
+            | Q(open_count=values[0], first_flagged=first, id__gt=values[2])
+        )
+
+    rows = list(counters[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor([last.open_count, last.first_flagged.isoformat(), last.id])
+
+    by_model = defaultdict(list)
+    models = {content_type.pk: content_type.model_class() for content_type in ContentType.objects.get_for_models(*CONTENT_TYPES.values()).values()}
+    for row in rows:
+        by_model[models[row.content_type_id]].append(row.object_id)
+
+    targets, reasons = {}, defaultdict(dict)
+    for model, ids in by_model.items():
+        # Answers show the title of their question
+        related = ['user', 'question'] if model is Answer else ['user']
+        targets[model] = model.objects.select_related(*related).in_bulk(ids)
+        field = model._meta.model_name
+        for flag in Flag.objects.filter(flags_on(model, ids), resolved=False).values(field, 'reason').annotate(n=Count('pk')):
+            reasons[model, flag[field]][flag['reason']] = flag['n']
+
+    items = []
+    for row in rows:
+        model = models[row.content_type_id]
+        items.append({
+            'type': model._meta.model_name,
+            'id': row.object_id,
+            'open_flags': row.open_count,
+            'total_flags': row.count,
+            'first_flagged': row.first_flagged,
+            'reasons': reasons[model, row.object_id],
+            # None when the post went away between the two reads
+            'content': content_summary(targets[model].get(row.object_id)),
+        })
+    return items, next_cursor
+
+
+def content_summary(instance):
+    """The fields of a flagged post a moderator needs to decide on it"""
+    if instance is None:
+        return None
+    summary = {'user': instance.user.username, 'created': instance.created}
+    if isinstance(instance, Question):
+        summary.update(title=instance.title, excerpt=instance.body[:EXCERPT_LENGTH])
+    elif isinstance(instance, Answer):
+        summary.update(question=instance.question_id, title=instance.question.title, excerpt=instance.body[:EXCERPT_LENGTH])
+    else:
+        summary.update(question=instance.question_id, answer=instance.answer_id, excerpt=instance.content[:EXCERPT_LENGTH])
+    return summary
+
+
+def parse_items(items):
+    """Group [{'type': 'question', 'id': 1}, ...] by model, raises ValueError on anything else"""
+    by_model = defaultdict(set)
+    if not isinstance(items, list) or not items:
+        raise ValueError('items must be a non-empty list')
+    for item in items:
+        model = CONTENT_TYPES.get(item.get('type')) if isinstance(item, dict) else None
+        if model is None or not isinstance(item.get('id'), int):
+            raise ValueError(f'Invalid item: {item!r}')
+        by_model[model].add(item['id'])
+    return by_model
+
+
+def _flags(by_model):
+    condition = Q()
+    for model, ids in by_model.items():
+        condition |= flags_on(model, ids)
+    return Flag.objects.filter(condition, resolved=False)
+
+
+def _counters(by_model):
+    content_types = ContentType.objects.get_for_models(*by_model)
+    condition = Q()
+    for model, ids in by_model.items():
+        condition |= Q(content_type=content_types[model], object_id__in=ids)
+    return FlagCounter.objects.filter(condition)
+
+
+def resolve(by_model):
+    """
+    Uphold the open flags on these posts, the posts stay as they are.
+
+    One UPDATE marks the flags resolved across every content type and one
+    UPDATE takes the posts out of the queue. Returns how many flags were
+    resolved.
+    """
+    with transaction.atomic():
+        resolved = _flags(by_model).update(resolved=True)
+        _counters(by_model).update(open_count=0, first_flagged=None)
+    return resolved
+
+
+def dismiss(by_model):
+    """
+    Reject the open flags on these posts.
+
+    Same two UPDATEs as `resolve`, except the dismissed flags are taken off
+    the count the flag penalty is measured against. A penalty already
+    applied is not refunded, but a counter that drops back below
+    PENALTY_THRESHOLD is no longer penalized, so the next crossing costs
+    the author the penalty again. Returns how many flags were dismissed.
+    """
+    with transaction.atomic():
+        dismissed = _flags(by_model).update(resolved=True)
+        # Both sides of the UPDATE read the counts from before it
+        _counters(by_model).update(
+            count=F('count') - F('open_count'), open_count=0, first_flagged=None,
+            penalized=Case(When(count__gte=F('open_count') + PENALTY_THRESHOLD, then=F('penalized')), default=Value(False)),
+        )
+    return dismissed
+
+
+def delete(by_model):
+    """
+    Delete the flagged posts, with the answers and comments under them.
+
+    The post_delete receivers cleaning up after one post run a query or two
+    per row, so they are kept off this path: the batch is deleted bottom-up
+    with one DELETE per table, votes, flag counters, flags, tag links,
+    comments, answers and questions, after two reads collecting the answers
+    and comments that go along. The index queue and the detail cache are
+    then told about every deleted row. Returns how many of the given posts
+    were deleted.
+    """
+    with transaction.atomic():
+        questions = set(Question.objects.filter(pk__in=by_model.get(Question, ())).values_list('pk', flat=True))
+        answers = set(Answer.objects.filter(Q(pk__in=by_model.get(Answer, ())) | Q(question__in=questions)).values_list('pk', flat=True))
+        comments = set(Comment.objects.filter(
+            Q(pk__in=by_model.get(Comment, ())) | Q(question__in=questions) | Q(answer__in=answers),
+        ).values_list('pk', flat=True))
+        doomed = {model: ids for model, ids in ((Question, questions), (Answer, answers), (Comment, comments)) if ids}
+        if not doomed:
+            return 0
+
+        votes = Q()
+        for model, ids in doomed.items():
+            votes |= Q(target_type=TARGET_TYPES[model], target_id__in=ids)
+        Vote.objects.filter(votes).delete()
+        _counters(doomed).delete()
+        Flag.objects.filter(Q(question__in=questions) | Q(answer__in=answers) | Q(comment__in=comments)).delete()
+        QuestionTag.objects.filter(question__in=questions).delete()
+        for model in (Comment, Answer, Question):
+            if model in doomed:
+                queryset = model.objects.filter(pk__in=doomed[model])
+                queryset._raw_delete(queryset.db)
+
+    for model, ids in doomed.items():
+        for pk in ids:
+            index_queue.mark(model, pk, 'delete')
+    detail_cache.bump(*questions)
+    return sum(len(doomed.get(model, set()) & set(ids)) for model, ids in by_model.items())
+
+
+ACTIONS = {'resolve': resolve, 'dismiss': dismiss, 'delete': delete}
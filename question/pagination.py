@@ -0,0 +1,93 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+PAGE_SIZE = 10
+MAX_PAGE_SIZE = 50
+
+
+def get_page(value, default=1):
+    """Parse a 1-based page number the way the views always did, falling back to `default`"""
+    if not str(value).isdigit():
+        return default
+    return max(int(value), 1)
+
+
+def get_page_size(value, default=PAGE_SIZE):
+    """Parse a requested page size and clamp it to MAX_PAGE_SIZE"""
+    if not str(value).isdigit() or int(value) < 1:
+        return default
+    return min(int(value), MAX_PAGE_SIZE)
+
+
+def encode_cursor(values):
+    """Turn a list of sort values into an opaque, URL-safe cursor token"""
+    raw = json.dumps(list(values), separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Inverse of `encode_cursor`, raises ValueError for a malformed token"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        values = json.loads(raw)
+    except (TypeError, ValueError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def keyset_page(queryset, cursor=None, page_size=PAGE_SIZE, offset=0):
+    """
+    One page of `queryset`, newest first, by keyset pagination on (created, id).
+
+    `cursor` is the token returned with the previous page, the rows after it
+    are found through the (created, id) ordering instead of an OFFSET, so a
+    page costs the same however deep it is. `offset` is only honoured without
+    a cursor, for clients still asking for numbered pages. Returns the rows
+    and the cursor of the next page, None on the last page. Raises ValueError
+    for a malformed cursor.
+    """
+    queryset = queryset.order_by('-created', '-id')
+    if cursor:
+        values = decode_cursor(cursor)
+        created = parse_datetime(values[0]) if len(values) == 2 and isinstance(values[0], str) else None
+        if created is None or not isinstance(values[1], int):
+            raise ValueError('Invalid cursor')
+        queryset = queryset.filter(Q(created__lt=created) | Q(created=created, id__lt=values[1]))
+        offset = 0
+
+    rows = list(queryset[offset:offset + page_size + 1])
+    if len(rows) <= page_size:
+        return rows, None
+    rows = rows[:page_size]
+    return rows, encode_cursor([rows[-1].created.isoformat(), rows[-1].id])
+
+
+def id_page(queryset, field, cursor=None, page_size=PAGE_SIZE, offset=0):
+    """
+    One page of the values of the integer column `field` of `queryset`, highest first.
+
+    Keyset pagination on that one column, for link tables whose index ends
+    in it, such as (tag, question) for the questions of a tag, newest first
+    since ids grow with time. `cursor` and `offset` work as in `keyset_page`.
+    Returns the values and the cursor of the next page, None on the last
+    page. Raises ValueError for a malformed cursor.
+    """
+    queryset = queryset.order_by(f'-{field}')
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != 1 or not isinstance(values[0], int):
+            raise ValueError('Invalid cursor')
+        queryset = queryset.filter(**{f'{field}__lt': values[0]})
+        offset = 0
+
+    ids = list(queryset.values_list(field, flat=True)[offset:offset + page_size + 1])
+    if len(ids) <= page_size:
+        return ids, None
+    ids = ids[:page_size]
+    return ids, encode_cursor([ids[-1]])
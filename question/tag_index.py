@@ -0,0 +1,159 @@
+import bisect
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Tag
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'TIMEOUT': 300,  # seconds before the index is reloaded to pick up tags changed by other processes
+    'LIMIT': 100,  # most tags returned for one prefix
+    'WARM': True,  # load the index in the background when HAL.wsgi or HAL.asgi starts a server process
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'TAG_INDEX', {}).get(name, DEFAULTS[name])
+
+
+class TagPrefixIndex:
+    """
+    Sorted in-memory copy of the tag names for autocomplete.
+
+    Tags are kept ordered by their casefolded name, so the tags starting with
+    a prefix are one contiguous slice found with two binary searches. A tag
+    saved or deleted in this process is inserted or removed in place. Every
+    TIMEOUT seconds the whole table is reloaded in a background thread, for
+    tags changed by other processes, while searches keep using the old
+    lists. Only the first search of a process that was not warmed up, see
+    `warm`, waits for a load.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._tags = []
+        self._positions = {}  # tag id -> casefolded name, to find a renamed or deleted tag
+        self._loaded = None
+        self._loading = None  # changes made during a reload, replayed onto its result
+        self._lock = threading.Lock()
+
+    def search(self, prefix, limit=None):
+        """Tags whose name starts with `prefix`, ignoring case, as dicts ordered by name"""
+        keys, tags = self._snapshot()
+        prefix = prefix.casefold()
+        start = bisect.bisect_left(keys, prefix)
+        end = bisect.bisect_left(keys, prefix + '\U0010ffff', lo=start)
+        return tags[start:min(end, start + (limit or get_setting('LIMIT')))]
+
+    def warm(self):
+        """Load the index in a background thread, so the first search after a start does not pay for it"""
+        self._reload_in_background()
+
+    def update(self, tag):
+        """Insert a new tag or move a saved one to the place of its name"""
+        self._change(('update', tag.pk, tag.name, tag.description))
+
+    def remove(self, pk):
+        self._change(('remove', pk))
+
+    def _change(self, change):
+        with self._lock:
+            if self._loading is not None:
+                self._loading.append(change)
+            # Readers keep using the lists they already hold, changes go to copies
+            keys, tags = list(self._keys), list(self._tags)
+            self._apply(keys, tags, self._positions, change)
+            self._keys, self._tags = keys, tags
+
+    @staticmethod
+    def _apply(keys, tags, positions, change):
+        pk = change[1]
+        old = positions.pop(pk, None)
+        if old is not None:
+            index = bisect.bisect_left(keys, old)
+            while tags[index]['id'] != pk:
+                index += 1
+            del keys[index], tags[index]
+        if change[0] == 'update':
+            key = change[2].casefold()
+            index = bisect.bisect_right(keys, key)
+            keys.insert(index, key)
+            tags.insert(index, {'id': pk, 'name': change[2], 'description': change[3]})
+            positions[pk] = key
+
+    def _snapshot(self):
+        with self._lock:
+            loaded = self._loaded
+        if loaded is None:
+            self.load()
+        elif time.monotonic() - loaded >= get_setting('TIMEOUT'):
+            self._reload_in_background()
+        with self._lock:
+            return self._keys, self._tags
+
+    def _reload_in_background(self):
+        with self._lock:
+            if self._loading is not None:
+                return
+            self._loading = []
+        threading.Thread(target=self._reload, name='tag-index-reload', daemon=True).start()
+
+    def _reload(self):
+        try:
+            self.load()
+        except Exception:
+            # Searches keep the old lists, the next one after TIMEOUT tries again
+            logger.exception('Reloading the tag prefix index failed')
+            with self._lock:
+                if self._loaded is not None:
+                    self._loaded = time.monotonic()
+        finally:
+            close_old_connections()
+
+    def load(self):
+        """Load the whole Tag table on this thread and replace the lists"""
+        with self._lock:
+            if self._loading is None:
+                self._loading = []
+        loaded = time.monotonic()
+        try:
+            rows = sorted(
+                ((name.casefold(), {'id': pk, 'name': name, 'description': description})
+                 for pk, name, description in Tag.objects.values_list('id', 'name', 'description').iterator()),
+                key=lambda row: row[0],
+            )
+        except Exception:
+            with self._lock:
+                self._loading = None
+            raise
+        keys = [key for key, _ in rows]
+        tags = [tag for _, tag in rows]
+        positions = {tag['id']: key for key, tag in rows}
+        with self._lock:
+            # Saves and deletes of this process that raced with the load
+            for change in self._loading or ():
+                self._apply(keys, tags, positions, change)
+            self._keys, self._tags, self._positions = keys, tags, positions
+            self._loaded = loaded
+            self._loading = None
+
+
+tag_index = TagPrefixIndex()
+
+
+@receiver(post_save, sender=Tag)
+def _update_tag_index(sender, instance, **kwargs):
+    tag_index.update(instance)
+
+
+@receiver(post_delete, sender=Tag)
+def _remove_from_tag_index(sender, instance, **kwargs):
+    tag_index.remove(instance.pk)
@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Tag
+from .indexing import index_queue
+from .tag_index import tag_index
+
+
+DEFAULTS = {
+    'CACHE_SIZE': 5000,  # tag names remembered per process
+    'TIMEOUT': 300,  # seconds a cached id is trusted, bounds staleness after a delete in another process
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'TAG_RESOLVER', {}).get(name, DEFAULTS[name])
+
+
+class TagResolver:
+    """
+    Turns tag names into Tag ids, creating the missing tags.
+
+    A whole list is resolved with one `filter(name__in=...)` and at most one
+    `bulk_create(ignore_conflicts=True)`, so concurrent requests creating the
+    same tag do not fail. Resolved ids are kept in a bounded LRU that drops a
+    tag when it is renamed or deleted in this process, entries older than
+    TIMEOUT are looked up again for changes made by other processes.
+    """
+
+    def __init__(self):
+        self._ids = OrderedDict()  # name -> (id, resolved at)
+        self._names = {}  # id -> name, to drop renamed tags
+        self._lock = threading.Lock()
+
+    def resolve(self, names):
+        """Return the ids of the tags named in `names`, in order and without duplicates"""
+        names = list(dict.fromkeys(names))
+        ids = self._cached(names)
+        missing = [name for name in names if name not in ids]
+        if missing:
+            found = dict(Tag.objects.filter(name__in=missing).values_list('name', 'id'))
+            new = [name for name in missing if name not in found]
+            if new:
+                # bulk_create neither returns ids with ignore_conflicts nor sends post_save
+                Tag.objects.bulk_create([Tag(name=name) for name in new], ignore_conflicts=True)
+                created = dict(Tag.objects.filter(name__in=new).values_list('name', 'id'))
+                for name, pk in created.items():
+                    index_queue.mark(Tag, pk)
+                    tag_index.update(Tag(pk=pk, name=name))
+                found.update(created)
+            self._remember(found)
+            ids.update(found)
+        return [ids[name] for name in names]
+
+    def forget(self, pk=None):
+        """Drop one tag from the cache, or all of them"""
+        with self._lock:
+            if pk is None:
+                self._ids.clear()
+                self._names.clear()
+            elif pk in self._names:
+                self._ids.pop(self._names.pop(pk), None)
+
+    def _cached(self, names):
+        expired = time.monotonic() - get_setting('TIMEOUT')
+        ids = {}
+        with self._lock:
+            for name in names:
+                entry = self._ids.get(name)
+                if entry is not None and entry[1] > expired:
+                    self._ids.move_to_end(name)
+                    ids[name] = entry[0]
+        return ids
+
+    def _remember(self, found):
+        now = time.monotonic()
+        size = get_setting('CACHE_SIZE')
+        with self._lock:
+            for name, pk in found.items():
+                self._ids[name] = (pk, now)
+                self._ids.move_to_end(name)
+                self._names[pk] = name
+            while len(self._ids) > size:
+                _, (pk, _) = self._ids.popitem(last=False)
+                self._names.pop(pk, None)
+
+
+tag_resolver = TagResolver()
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def _forget_tag(sender, instance, **kwargs):
+    tag_resolver.forget(instance.pk)
@@ -1,3 +1,702 @@
-from django.test import TestCase
+import re
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
+import reversion
+from reversion.models import Revision, Version
+
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.db.models import QuerySet
+from django.http import Http404
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from user.models import ReputationEvent
+from .models import Question, Answer, Comment, Tag, QuestionTag, Flag, FlagCounter, Vote
+from .votes import cast_vote, VoteError, UPVOTE, DOWNVOTE
+from .flags import record_flag, PENALTY_THRESHOLD
+from .versioning import version_state, serialized_fields, state_data, as_of
+from .management.commands.compact_versions import retained
+from .indexing import IndexQueue, LocalBackend, index_queue
+from .view_counter import ViewCounter
+from .tag_index import TagPrefixIndex
+from .tags import tag_resolver
+from .pagination import encode_cursor
+from . import moderation
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Plans are read from SQLite EXPLAIN QUERY PLAN')
+class HotQueryPlanTests(TestCase):
+    """
+    EXPLAIN QUERY PLAN of the lookups on the request path.
+
+    Each query must reach its table through an index, a plan that scans the
+    table or sorts the rows in a temporary b-tree means an index went
+    missing or stopped matching the query.
+    """
+
+    def explain(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return '\n'.join(row[-1] for row in cursor.fetchall())
+
+    def assertIndexed(self, queryset, index=None):
+        return self.assertPlan(self.explain(*queryset.query.sql_with_params()), queryset.model._meta.db_table, index)
+
+    def assertUpdateIndexed(self, queryset, index=None, **values):
+        with CaptureQueriesContext(connection) as queries:
+            queryset.update(**values)
+        return self.assertPlan(self.explain(queries[-1]['sql']), queryset.model._meta.db_table, index)
+
+    def assertPlan(self, plan, table, index=None):
+        self.assertIsNone(re.search(rf'\bSCAN {table}\b', plan), f'Full scan of {table}:\n{plan}')
+        self.assertNotIn('TEMP B-TREE', plan, f'Rows of {table} sorted outside an index:\n{plan}')
+        if index is not None:
+            self.assertRegex(plan, rf'USING (COVERING )?INDEX {index}\b', f'{index} not used:\n{plan}')
+        return plan
+
+    def test_vote_switch(self):
+        # The conditional UPDATE of question.votes.cast_vote, one probe of the unique index
+        votes = Vote.objects.filter(user_id=1, target_type=Vote.ANSWER, target_id=1).exclude(value=Vote.UPVOTE)
+        plan = self.assertUpdateIndexed(votes, value=Vote.UPVOTE)
+        self.assertIn('(user_id=? AND target_type=? AND target_id=?)', plan)
+
+    def test_vote_lookup(self):
+        plan = self.assertIndexed(Vote.objects.filter(user_id=1, target_type=Vote.COMMENT, target_id=1))
+        self.assertIn('(user_id=? AND target_type=? AND target_id=?)', plan)
+
+    def test_votes_of_a_user(self):
+        # question.votes.votes_for, a page of posts and the whole set loaded into the cache
+        votes = Vote.objects.filter(user_id=1, target_type=Vote.ANSWER)
+        plan = self.assertIndexed(votes.filter(target_id__in=[1, 2, 3]).values_list('target_id', 'value'))
+        self.assertIn('(user_id=? AND target_type=? AND target_id=?)', plan)
+        plan = self.assertIndexed(votes.values_list('target_id', 'value')[:5001])
+        self.assertIn('(user_id=? AND target_type=?)', plan)
+
+    def test_votes_of_a_post(self):
+        votes = Vote.objects.filter(target_type=Vote.QUESTION, target_id=1, value=Vote.UPVOTE)
+        self.assertIndexed(votes.values('id'), 'vote_target')
+
+    def test_flag_by_user_and_target(self):
+        self.assertIndexed(Flag.objects.filter(user_id=1, question_id=1), 'flag_user_question')
+        self.assertIndexed(Flag.objects.filter(user_id=1, answer_id=1), 'flag_user_answer')
+        self.assertIndexed(Flag.objects.filter(user_id=1, comment_id=1), 'flag_user_comment')
+
+    def test_user_feeds(self):
+        for model in (Question, Answer, Comment):
+            with self.subTest(model=model.__name__):
+                feed = model.objects.filter(user_id=1).order_by('-created', '-id')
+                self.assertIndexed(feed[:11], f'{model._meta.model_name}_user_created')
+
+    def test_tag_by_name(self):
+        self.assertIndexed(Tag.objects.filter(name__in=['python', 'django']))
+
+    def test_questions_of_a_tag(self):
+        # TagsDetailView, a page of the tag's questions newest first and the count
+        links = QuestionTag.objects.filter(tag_id=1).order_by('-question_id').values_list('question_id', flat=True)
+        self.assertIndexed(links[:11], 'question_tag_newest')
+        self.assertIndexed(links.filter(question_id__lt=100)[:11], 'question_tag_newest')
+        self.assertIndexed(QuestionTag.objects.filter(tag_id=1).values('id')[:1], 'question_tag_newest')
+
+    def test_version_as_of(self):
+        # question.versioning.as_of, the versions of one object newest first through the unique index of reversion
+        versions = Version.objects.get_for_object_reference(Question, 1).filter(revision__date_created__lte=timezone.now())
+        plan = self.assertIndexed(versions.order_by('-revision_id')[:1])
+        self.assertIn('(db=? AND content_type_id=? AND object_id=?)', plan)
+
+    def test_moderation_queue(self):
+        queue = FlagCounter.objects.filter(open_count__gt=0).order_by('-open_count', 'first_flagged', 'id')
+        self.assertIndexed(queue[:11], 'flag_queue')
+
+
+@override_settings(ELASTICSEARCH_DSL_AUTOSYNC=False)
+class CastVoteTests(TestCase):
+    """question.votes.cast_vote: the Vote row, the counters and the reputation ledger move together"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.voter = User.objects.create_user(username='voter')
+        cls.question = Question.objects.create(user=cls.author, title='Title', body='Body')
+        cls.answer = Answer.objects.create(user=cls.author, question=cls.question, body='Answer')
+        cls.comment = Comment.objects.create(user=cls.author, question=cls.question, content='Comment')
+
+    def counters(self, instance):
+        return type(instance).objects.values_list('upvotes', 'downvotes').get(pk=instance.pk)
+
+    def ledger(self):
+        return sorted(ReputationEvent.objects.filter(reason__in=['VOTE_RECEIVED', 'VOTE_CAST']).values_list('user_id', 'reason', 'delta'))
+
+    def test_upvote(self):
+        result = cast_vote(self.voter, Question, self.question.pk, UPVOTE)
+        self.assertEqual(result, {'message': 'Question upvoted successfully', 'upvotes': 1})
+        self.assertEqual(self.counters(self.question), (1, 0))
+        vote = Vote.objects.get(user=self.voter)
+        self.assertEqual((vote.target_type, vote.target_id, vote.value), (Vote.QUESTION, self.question.pk, Vote.UPVOTE))
+        self.assertEqual(self.ledger(), [(self.author.pk, 'VOTE_RECEIVED', 5), (self.voter.pk, 'VOTE_CAST', 1)])
+
+    def test_repeated_vote_is_rejected(self):
+        cast_vote(self.voter, Answer, self.answer.pk, UPVOTE)
+        with self.assertRaisesMessage(VoteError, 'Already upvoted'):
+            cast_vote(self.voter, Answer, self.answer.pk, UPVOTE)
+        self.assertEqual(self.counters(self.answer), (1, 0))
+        self.assertEqual(Vote.objects.count(), 1)
+        self.assertEqual(len(self.ledger()), 2)
+
+    def test_switch_vote(self):
+        cast_vote(self.voter, Question, self.question.pk, UPVOTE)
+        result = cast_vote(self.voter, Question, self.question.pk, DOWNVOTE)
+        self.assertEqual(result, {'message': 'Vote updated successfully', 'upvotes': 0, 'downvotes': 1})
+        self.assertEqual(self.counters(self.question), (0, 1))
+        self.assertEqual(Vote.objects.get(user=self.voter).value, Vote.DOWNVOTE)
+        self.assertEqual(self.ledger(), [
+            (self.author.pk, 'VOTE_RECEIVED', -5), (self.author.pk, 'VOTE_RECEIVED', 5),
+            (self.voter.pk, 'VOTE_CAST', -1), (self.voter.pk, 'VOTE_CAST', 1),
+        ])
+
+    def test_own_post(self):
+        with self.assertRaisesMessage(VoteError, 'You cannot downvote your own comment'):
+            cast_vote(self.author, Comment, self.comment.pk, DOWNVOTE)
+        self.assertEqual(self.counters(self.comment), (0, 0))
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual(self.ledger(), [])
+
+    def test_comment_downvote(self):
+        result = cast_vote(self.voter, Comment, self.comment.pk, DOWNVOTE)
+        self.assertEqual(result, {'message': 'Comment downvoted successfully', 'downvotes': 1})
+        self.assertEqual(self.counters(self.comment), (0, 1))
+        self.assertEqual(self.ledger(), [(self.author.pk, 'VOTE_RECEIVED', -2), (self.voter.pk, 'VOTE_CAST', -1)])
+
+    def test_missing_post(self):
+        with self.assertRaises(Http404):
+            cast_vote(self.voter, Question, self.question.pk + 1000, UPVOTE)
+
+
+@override_settings(ELASTICSEARCH_DSL_AUTOSYNC=False)
+class FlagPenaltyTests(TestCase):
+    """question.flags.record_flag: one penalty per crossing of PENALTY_THRESHOLD, dismissals included"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.flagger = User.objects.create_user(username='flagger')
+        cls.question = Question.objects.create(user=cls.author, title='Title', body='Body')
+
+    def flag(self, times):
+        return [record_flag(self.question, self.flagger) for _ in range(times)]
+
+    def penalties(self):
+        return ReputationEvent.objects.filter(user=self.author, reason='FLAG_PENALTY').count()
+
+    def counter(self):
+        return FlagCounter.objects.values_list('count', 'penalized').get()
+
+    def test_one_penalty_per_crossing(self):
+        fired = self.flag(PENALTY_THRESHOLD + 3)
+        self.assertEqual(fired.index(True), PENALTY_THRESHOLD - 1)
+        self.assertEqual(fired.count(True), 1)
+        self.assertEqual(self.penalties(), 1)
+
+    def test_dismissal_below_the_threshold_allows_a_new_crossing(self):
+        self.flag(PENALTY_THRESHOLD)
+        moderation.dismiss({Question: {self.question.pk}})
+        self.assertEqual(self.counter(), (0, False))
+        fired = self.flag(PENALTY_THRESHOLD + 1)
+        self.assertEqual(fired.count(True), 1)
+        self.assertEqual(self.penalties(), 2)
+
+    def test_dismissal_above_the_threshold_keeps_the_penalty(self):
+        self.flag(PENALTY_THRESHOLD)
+        moderation.resolve({Question: {self.question.pk}})
+        self.flag(2)
+        moderation.dismiss({Question: {self.question.pk}})
+        self.assertEqual(self.counter(), (PENALTY_THRESHOLD, True))
+        self.assertEqual(self.flag(3).count(True), 0)
+        self.assertEqual(self.penalties(), 1)
+
+    def test_crossing_by_a_racing_flag_is_not_penalized_twice(self):
+        self.flag(PENALTY_THRESHOLD - 1)
+        update = QuerySet.update
+        raced = []
+
+        def racing_update(queryset, **kwargs):
+            rows = update(queryset, **kwargs)
+            if queryset.model is FlagCounter and not raced:
+                # Another flag crosses the threshold between the two UPDATEs of this one
+                raced.append(None)
+                raced[0] = record_flag(self.question, self.flagger)
+            return rows
+
+        with patch.object(QuerySet, 'update', autospec=True, side_effect=racing_update):
+            fired = record_flag(self.question, self.flagger)
+        self.assertEqual((raced, fired), ([True], False))
+        self.assertEqual(self.counter(), (PENALTY_THRESHOLD + 1, True))
+        self.assertEqual(self.penalties(), 1)
+
+
+@override_settings(ELASTICSEARCH_DSL_AUTOSYNC=False)
+class ModerationDeleteTests(TestCase):
+    """question.moderation.delete: the posts go with everything hanging off them, in a fixed number of queries"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.voter = User.objects.create_user(username='voter')
+        cls.tag = Tag.objects.create(name='python')
+        cls.questions = [cls.thread(n) for n in range(4)]
+
+    @classmethod
+    def thread(cls, n):
+        question = Question.objects.create(user=cls.author, title=f'Question {n}', body='Body')
+        question.tags.add(cls.tag)
+        answer = Answer.objects.create(user=cls.author, question=question, body='Answer')
+        comment = Comment.objects.create(user=cls.author, answer=answer, content='Comment')
+        for model, post in ((Question, question), (Answer, answer), (Comment, comment)):
+            cast_vote(cls.voter, model, post.pk, UPVOTE)
+            record_flag(post, cls.voter)
+        Flag.objects.create(user=cls.voter, question=question, reason='SPAM')
+        Flag.objects.create(user=cls.voter, question=question, answer=answer, reason='SPAM')
+        Flag.objects.create(user=cls.voter, question=question, answer=answer, comment=comment, reason='SPAM')
+        return question
+
+    def delete(self, questions):
+        with CaptureQueriesContext(connection) as queries:
+            deleted = moderation.delete({Question: {question.pk for question in questions}})
+        self.assertEqual(deleted, len(questions))
+        return len(queries)
+
+    def test_everything_under_the_posts_goes(self):
+        kept = self.questions[-1]
+        self.delete(self.questions[:-1])
+        self.assertEqual(list(Question.objects.all()), [kept])
+        self.assertEqual(list(Answer.objects.values_list('question', flat=True)), [kept.pk])
+        self.assertEqual(Comment.objects.get().answer.question, kept)
+        self.assertEqual(Vote.objects.count(), 3)
+        self.assertEqual(FlagCounter.objects.count(), 3)
+        self.assertEqual(set(Flag.objects.values_list('question', flat=True)), {kept.pk})
+        self.assertEqual(list(QuestionTag.objects.values_list('question', flat=True)), [kept.pk])
+
+    def test_queries_do_not_grow_with_the_batch(self):
+        self.assertEqual(self.delete(self.questions[:1]), self.delete(self.questions[1:]))
+
+    def test_answer_and_comment(self):
+        question = self.questions[0]
+        answer = question.answers.get()
+        other_comment = Comment.objects.exclude(answer=answer).first()
+        self.assertEqual(moderation.delete({Answer: {answer.pk}, Comment: {other_comment.pk, 0}}), 2)
+        self.assertFalse(Comment.objects.filter(pk__in=[other_comment.pk]).exists())
+        self.assertFalse(Comment.objects.filter(answer=answer).exists())
+        self.assertEqual(Vote.objects.filter(target_type=Vote.QUESTION, target_id=question.pk).count(), 1)
+        self.assertFalse(Vote.objects.filter(target_type=Vote.ANSWER, target_id=answer.pk).exists())
+
+
+@override_settings(ELASTICSEARCH_DSL_AUTOSYNC=False)
+class TagsDetailTests(TestCase):
+    """TagsDetailView: the questions of a tag newest first, by page number or cursor"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        cls.tag = Tag.objects.create(name='python')
+        other = Tag.objects.create(name='django')
+        cls.questions = []
+        for n in range(5):
+            question = Question.objects.create(user=cls.user, title=f'Question {n}', body='Body')
+            question.tags.add(*([cls.tag, other] if n % 2 else [cls.tag]))
+            cls.questions.append(question)
+        Question.objects.create(user=cls.user, title='Untagged', body='Body').tags.add(other)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def page(self, **data):
+        response = self.client.post('/API/qa/TagsDetail/', {'query': 'python', 'page_size': 2, **data}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['data']
+
+    def test_cursor_pages(self):
+        seen, cursor = [], None
+        while True:
+            data = self.page(cursor=cursor) if cursor else self.page()
+            seen.extend((item['title'], item['tags']) for item in data['tags'])
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual([title for title, _ in seen], [f'Question {n}' for n in (4, 3, 2, 1, 0)])
+        self.assertEqual(sorted(seen[1][1]), ['django', 'python'])
+        self.assertEqual((data['total'], data['total_pages']), (5, 3))
+
+    def test_numbered_page(self):
+        data = self.page(page=2)
+        self.assertEqual([item['title'] for item in data['tags']], ['Question 2', 'Question 1'])
+        self.assertEqual(data['next_page'], 3)
+
+    def test_invalid_cursor(self):
+        response = self.client.post('/API/qa/TagsDetail/', {'query': 'python', 'cursor': encode_cursor(['2024-01-01T00:00:00', 1])}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(ELASTICSEARCH_DSL_AUTOSYNC=False)
+class UserFeedETagTests(TestCase):
+    """The feed ETags change with every serialized field, including those written without a save()"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.asker = User.objects.create_user(username='asker')
+        cls.answerer = User.objects.create_user(username='answerer')
+        cls.question = Question.objects.create(user=cls.asker, title='Title', body='Body')
+        cls.first = Answer.objects.create(user=cls.answerer, question=cls.question, body='First')
+        cls.second = Answer.objects.create(user=cls.asker, question=cls.question, body='Second')
+        cls.tag = Tag.objects.create(name='python')
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def poll(self, client, path, etag):
+        return client.get(path, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_page_is_not_modified(self):
+        client = self.client_for(self.answerer)
+        etag = client.get('/API/qa/get-all-answers/')['ETag']
+        self.assertEqual(self.poll(client, '/API/qa/get-all-answers/', etag).status_code, 304)
+
+    def test_answer_unaccepted_by_another_accept(self):
+        self.client_for(self.asker).post(f'/API/qa/answers/{self.first.pk}/accept/')
+        client = self.client_for(self.answerer)
+        etag = client.get('/API/qa/get-all-answers/')['ETag']
+        self.client_for(self.asker).post(f'/API/qa/answers/{self.second.pk}/accept/')
+        response = self.poll(client, '/API/qa/get-all-answers/', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([answer['is_accepted'] for answer in response.json()], [False])
+        self.assertEqual(self.poll(client, '/API/qa/get-all-answers/', response['ETag']).status_code, 304)
+
+    def test_question_tags_changed(self):
+        client = self.client_for(self.asker)
+        etag = client.get('/API/qa/get-all-questions/')['ETag']
+        self.question.tags.add(self.tag)
+        response = self.poll(client, '/API/qa/get-all-questions/', etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['tags'], [self.tag.pk])
+        self.assertEqual(self.poll(client, '/API/qa/get-all-questions/', response['ETag']).status_code, 304)
+
+
+@override_settings(ELASTICSEARCH_DSL_AUTOSYNC=False)
+class VersionAsOfTests(TestCase):
+    """question.versioning.as_of: the snapshot of the version current at a point in time"""
+
+    EDITS = 8
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        with reversion.create_revision():
+            cls.question = Question.objects.create(user=cls.author, title='Title 0', body='First body')
+            # Same pk, other content type, must never be mistaken for a version of the question
+            cls.answer = Answer.objects.create(pk=cls.question.pk, user=cls.author, question=cls.question, body='Answer')
+        for n in range(1, cls.EDITS):
+            with reversion.create_revision():
+                cls.question.title = f'Title {n}'
+                cls.question.body = f'First body\nedit {n}' if n % 2 else f'Body rewritten at {n}'
+                cls.question.upvotes = n
+                cls.question.save()
+        # An hour apart, so that as_of never meets two versions saved in the same microsecond
+        cls.start = timezone.now() - timedelta(days=1)
+        for n, version in enumerate(Version.objects.get_for_object(cls.question).order_by('pk')):
+            Revision.objects.filter(pk=version.revision_id).update(date_created=cls.start + timedelta(hours=n))
+
+    def versions(self):
+        return list(Version.objects.get_for_object(self.question).select_related('revision').order_by('pk'))
+
+    def test_every_version_at_its_date_and_until_the_next(self):
+        for n, version in enumerate(self.versions()):
+            when = version.revision.date_created
+            expected = (version.pk, when, state_data(Question, serialized_fields(version)))
+            with self.subTest(version=n):
+                self.assertEqual(expected[2]['title'], f'Title {n}')
+                self.assertEqual(version_state(version, Question), expected[2])
+                self.assertEqual(as_of(Question, self.question.pk, when), expected)
+                self.assertEqual(as_of(Question, self.question.pk, when + timedelta(minutes=59)), expected)
+
+    def test_before_the_first_version(self):
+        self.assertIsNone(as_of(Question, self.question.pk, self.start - timedelta(seconds=1)))
+
+    def test_other_content_types_are_not_mixed_in(self):
+        self.assertEqual(as_of(Answer, self.answer.pk, timezone.now())[2]['body'], 'Answer')
+
+    def test_one_query(self):
+        as_of(Question, self.question.pk, timezone.now())  # content types cached
+        with self.assertNumQueries(1):
+            as_of(Question, self.question.pk, self.start + timedelta(hours=3))
+
+
+@override_settings(ELASTICSEARCH_DSL_AUTOSYNC=False)
+class CompactVersionsTests(TestCase):
+    """The compact_versions command: retention rules, and versions that still revert whole afterwards"""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        now = timezone.now()
+        noon = now.replace(hour=12, minute=0, second=0, microsecond=0)
+        self.dates = [
+            noon - timedelta(days=10), noon - timedelta(days=10, hours=-1),
+            noon - timedelta(days=9), noon - timedelta(days=9, hours=-1), noon - timedelta(days=9, hours=-2),
+            noon - timedelta(days=5), now - timedelta(hours=2), now - timedelta(hours=1),
+        ]
+        with reversion.create_revision():
+            self.question = Question.objects.create(user=self.author, title='Title 0', body='Body 0')
+        for n in range(1, len(self.dates)):
+            with reversion.create_revision():
+                self.question.title = f'Title {n}'
+                self.question.body = f'Body 0\nedit {n}'
+                self.question.save()
+        for version, date in zip(self.versions(), self.dates):
+            Revision.objects.filter(pk=version.revision_id).update(date_created=date)
+
+    def versions(self):
+        return list(Version.objects.get_for_object(self.question).select_related('revision').order_by('pk'))
+
+    def compact(self, *args):
+        out = StringIO()
+        call_command('compact_versions', 'question', *args, stdout=out, stderr=StringIO())
+        return out.getvalue()
+
+    def test_retained(self):
+        versions = [SimpleNamespace(pk=n, revision=SimpleNamespace(date_created=date)) for n, date in enumerate(self.dates)]
+        cutoff = timezone.now() - timedelta(days=1)
+        # The creation snapshot, the newest of days 10, 9 and 5, then everything after the cutoff
+        self.assertEqual(retained(versions, 0, cutoff), {0, 1, 4, 5, 6, 7})
+        self.assertEqual(retained(versions, 4, cutoff), {0, 1, 4, 5, 6, 7})
+        self.assertEqual(retained(versions, 6, cutoff), {0, 1, 2, 3, 4, 5, 6, 7})
+        self.assertEqual(retained(versions, 1, timezone.now()), {0, 1, 4, 5, 7})
+
+    def test_compaction_deletes_by_retention(self):
+        revisions = [version.revision_id for version in self.versions()]
+        dropped = sum(len(version.serialized_data) + len(version.object_repr) for version in self.versions()[2:4])
+        self.assertIn(f'Reclaimed {dropped:,} bytes of version data: 2 versions deleted across 1 objects', self.compact('--keep-last', '2', '--daily-after', '1'))
+        kept = self.versions()
+        self.assertEqual([version.revision.date_created for version in kept], [self.dates[n] for n in (0, 1, 4, 5, 6, 7)])
+        # The revisions of the deleted versions had nothing else in them
+        self.assertFalse(Revision.objects.filter(pk__in=[revisions[2], revisions[3]]).exists())
+
+    def test_versions_round_trip_after_compaction(self):
+        self.compact('--keep-last', '2', '--daily-after', '1')
+        kept = self.versions()
+        for version, n in zip(kept, (0, 1, 4, 5, 6, 7)):
+            with self.subTest(version=n):
+                self.assertEqual(version.field_dict['title'], f'Title {n}')
+                self.assertEqual(as_of(Question, self.question.pk, self.dates[n])[2], state_data(Question, serialized_fields(version)))
+
+        # What the admin does to revert, and to recover a deleted post
+        kept[2].revision.revert()
+        self.assertEqual(Question.objects.values_list('title', 'body').get(pk=self.question.pk), ('Title 4', 'Body 0\nedit 4'))
+        Question.objects.filter(pk=self.question.pk).delete()
+        kept[1].revert()
+        self.assertEqual(Question.objects.values_list('title', 'body').get(pk=self.question.pk), ('Title 1', 'Body 0\nedit 1'))
+
+    def test_compaction_is_idempotent(self):
+        self.compact('--keep-last', '2', '--daily-after', '1')
+        snapshots = [version.serialized_data for version in self.versions()]
+        self.assertIn('Reclaimed 0 bytes of version data: 0 versions deleted across 0 objects', self.compact('--keep-last', '2', '--daily-after', '1'))
+        self.assertEqual([version.serialized_data for version in self.versions()], snapshots)
+
+
+class FailingBackend(LocalBackend):
+    def send(self, document, actions):
+        raise ConnectionError('Cluster unreachable')
+
+
+@override_settings(
+    ELASTICSEARCH_DSL_AUTOSYNC=True,
+    SEARCH_INDEXING={'BACKEND': 'question.indexing.LocalBackend', 'FLUSH_INTERVAL': 3600},
+)
+class IndexQueueTests(TestCase):
+    """question.indexing.IndexQueue against LocalBackend: coalescing, partial updates and failures"""
+
+    @classmethod
+    def setUpTestData(cls):
+        with override_settings(ELASTICSEARCH_DSL_AUTOSYNC=False):
+            author = User.objects.create_user(username='author')
+            cls.question = Question.objects.create(user=author, title='Title', body='Body')
+            cls.tag = Tag.objects.create(name='python')
+            cls.question.tags.add(cls.tag)
+
+    def setUp(self):
+        self.queue = IndexQueue()
+        self.key = ('questions', str(self.question.pk))
+
+    def indexed(self):
+        self.queue.mark(Question, self.question.pk)
+        self.queue.flush()
+        self.queue.backend.requests.clear()
+
+    def test_repeated_marks_coalesce(self):
+        for _ in range(3):
+            self.queue.mark(Question, self.question.pk)
+        self.assertEqual(self.queue.pending(), {(Question, self.question.pk): 'index'})
+        self.assertEqual(self.queue.flush(), 1)
+        [actions] = self.queue.backend.requests
+        self.assertEqual([action['_op_type'] for action in actions], ['index'])
+        self.assertEqual(self.queue.backend.documents[self.key]['tags'], ['python'])
+        self.assertEqual(self.queue.pending(), {})
+
+    def test_delete_overrides_index(self):
+        self.indexed()
+        self.queue.mark(Question, self.question.pk, fields=['upvotes'])
+        self.queue.mark(Question, self.question.pk, 'delete')
+        self.queue.mark(Question, self.question.pk, fields=['views_count'])
+        self.assertEqual(self.queue.pending(), {(Question, self.question.pk): 'delete'})
+        self.queue.flush()
+        self.assertEqual([action['_op_type'] for action in self.queue.backend.requests[0]], ['delete'])
+        self.assertNotIn(self.key, self.queue.backend.documents)
+
+    def test_partial_update_carries_only_the_changed_fields(self):
+        self.indexed()
+        Question.objects.filter(pk=self.question.pk).update(views_count=7, downvotes=2)
+        self.queue.mark(Question, self.question.pk, fields=['views_count'])
+        self.queue.mark(Question, self.question.pk, fields=['downvotes'])
+        self.queue.flush()
+        [[action]] = self.queue.backend.requests
+        self.assertEqual(action['_op_type'], 'update')
+        self.assertEqual(set(action['doc']), {'views_count', 'popularity', 'downvotes'})
+        document = self.queue.backend.documents[self.key]
+        self.assertEqual((document['views_count'], document['downvotes'], document['title']), (7, 2, 'Title'))
+
+    def test_partial_update_of_a_missing_document_reindexes_it(self):
+        self.queue.mark(Question, self.question.pk, fields=['upvotes'])
+        self.queue.flush()
+        self.assertEqual(self.queue.backend.requests[0][0]['_op_type'], 'update')
+        self.assertEqual(self.queue.pending(), {(Question, self.question.pk): 'index'})
+        self.queue.flush()
+        self.assertEqual(self.queue.backend.documents[self.key]['title'], 'Title')
+
+    def test_failed_flush_is_requeued(self):
+        self.queue._backend = FailingBackend()
+        self.queue.mark(Question, self.question.pk)
+        self.queue.mark(Tag, self.tag.pk)
+        with self.assertRaises(ConnectionError):
+            self.queue.flush()
+        self.assertEqual(self.queue.pending(), {(Question, self.question.pk): 'index', (Tag, self.tag.pk): 'index'})
+        self.queue._backend = LocalBackend()
+        self.assertEqual(self.queue.flush(), 2)
+        self.assertIn(self.key, self.queue.backend.documents)
+
+    @override_settings(ELASTICSEARCH_DSL_AUTOSYNC=False)
+    def test_nothing_is_queued_without_autosync(self):
+        self.queue.mark(Question, self.question.pk, fields=['upvotes'])
+        self.assertEqual(self.queue.pending(), {})
+        self.assertIsNone(self.queue._thread)
+        # Writers that bypass the signal processor, here through the shared queue
+        with self.captureOnCommitCallbacks(execute=True):
+            cast_vote(User.objects.create_user(username='voter'), Question, self.question.pk, UPVOTE)
+        self.assertNotIn((Question, self.question.pk), index_queue.pending())
+
+
+@override_settings(ELASTICSEARCH_DSL_AUTOSYNC=False, VIEW_COUNTER={'FLUSH_INTERVAL': 3600})
+class ViewCounterTests(TestCase):
+    """question.view_counter: views pending in the shared cache, drained by any process"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        cls.first = Question.objects.create(user=author, title='First', body='Body')
+        cls.second = Question.objects.create(user=author, title='Second', body='Body')
+
+    def setUp(self):
+        # Two worker processes sharing the cache
+        self.worker, self.other = ViewCounter(), ViewCounter()
+        self.addCleanup(self.worker.cache.clear)
+
+    def views(self):
+        return dict(Question.objects.values_list('pk', 'views_count'))
+
+    def test_views_of_every_worker_are_flushed_by_the_command(self):
+        for _ in range(3):
+            self.worker.record(self.first.pk)
+        self.other.record(self.first.pk)
+        self.other.record(self.second.pk, 2)
+        self.assertEqual(ViewCounter().pending(), {self.first.pk: 4, self.second.pk: 2})
+        out = StringIO()
+        call_command('flush_view_counts', stdout=out)
+        self.assertIn('Flushed 6 views across 2 questions', out.getvalue())
+        self.assertEqual(self.views(), {self.first.pk: 4, self.second.pk: 2})
+        self.assertEqual(self.worker.pending(), {})
+        self.assertEqual(self.worker.flush(), 0)
+
+    def test_views_after_a_flush_are_pending_again(self):
+        self.worker.record(self.first.pk)
+        self.other.flush()
+        self.worker.record(self.first.pk)
+        self.worker.record(self.first.pk)
+        self.assertEqual(self.other.pending(), {self.first.pk: 2})
+        self.assertEqual(self.other.flush(), 1)
+        self.assertEqual(self.views()[self.first.pk], 3)
+
+    def test_failed_write_keeps_the_views(self):
+        self.worker.record(self.first.pk, 5)
+        with patch.object(Question.objects, 'filter', side_effect=DatabaseError('locked')):
+            with self.assertRaises(DatabaseError):
+                self.worker.flush()
+        self.assertEqual(self.other.pending(), {self.first.pk: 5})
+        self.other.flush()
+        self.assertEqual(self.views()[self.first.pk], 5)
+
+
+@override_settings(ELASTICSEARCH_DSL_AUTOSYNC=False)
+class TagPrefixIndexTests(TestCase):
+    """question.tag_index: tag changes are applied in place, reloads happen off the request thread"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = {name: Tag.objects.create(name=name) for name in ('django', 'Python', 'pytest', 'rust')}
+
+    def setUp(self):
+        self.index = TagPrefixIndex()
+        self.index.load()
+        for target in ('question.tag_index.tag_index', 'question.tags.tag_index'):
+            patcher = patch(target, self.index)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def names(self, prefix):
+        with self.assertNumQueries(0):
+            return [tag['name'] for tag in self.index.search(prefix)]
+
+    def test_saves_and_deletes_in_place(self):
+        self.assertEqual(self.names('py'), ['pytest', 'Python'])
+        Tag.objects.create(name='pyramid')
+        python = self.tags['Python']
+        python.name = 'Cython'
+        python.save()
+        self.tags['pytest'].delete()
+        self.assertEqual(self.names('py'), ['pyramid'])
+        self.assertEqual(self.names('c'), ['Cython'])
+        self.assertEqual(self.names(''), ['Cython', 'django', 'pyramid', 'rust'])
+
+    def test_tags_created_by_the_resolver(self):
+        tag_resolver.resolve(['rustls', 'rust'])
+        self.assertEqual(self.names('rust'), ['rust', 'rustls'])
+
+    @override_settings(TAG_INDEX={'TIMEOUT': 0})
+    def test_stale_index_is_served_while_reloading(self):
+        with patch.object(self.index, '_reload_in_background') as reload:
+            self.assertEqual(self.names('d'), ['django'])
+        reload.assert_called_once_with()
+
+    def test_changes_during_a_reload_survive_it(self):
+        self.index._loading = []
+        ghost = Tag(pk=10 ** 6, name='ghost')
+        self.index.update(ghost)
+        self.index.remove(self.tags['django'].pk)
+        self.index.load()
+        self.assertEqual(self.names(''), ['ghost', 'pytest', 'Python', 'rust'])
+        self.assertIsNone(self.index._loading)
@@ -27,7 +27,17 @@ from .views import (
     UpdateCommentView,
     DeleteQuestionView,
     DeleteAnswerView,
-    DeleteCommentView
+    DeleteCommentView,
+    QuestionVersionDiffsView,
+    AnswerVersionDiffsView,
+    CommentVersionDiffsView,
+    QuestionAsOfView,
+    AnswerAsOfView,
+    CommentAsOfView,
+    ModerationQueueView,
+    ModerationActionView,
+    MyVotesView,
+    DetailCacheStatsView,
 )
 
 urlpatterns = [
@@ -46,6 +56,12 @@ urlpatterns = [
     path('question-version/<int:pk>/versions/<int:vid>/',GetQuestionVersionView.as_view(), name="Get-question-version"), #
     path('get-all-version-answers/<int:pk>/',GetAllAnswerVersionsView.as_view(), name="GetAllAnswerVersionsView"), #
     path('get-all-version-comments/<int:pk>/',GetAllCommentVersionsView.as_view(), name="GetAllCommentVersionsView"), #
+    path('get-version-diffs-questions/<int:pk>/', QuestionVersionDiffsView.as_view(), name='get-version-diffs-questions'),
+    path('get-version-diffs-answers/<int:pk>/', AnswerVersionDiffsView.as_view(), name='get-version-diffs-answers'),
+    path('get-version-diffs-comments/<int:pk>/', CommentVersionDiffsView.as_view(), name='get-version-diffs-comments'),
+    path('question-as-of/<int:pk>/', QuestionAsOfView.as_view(), name='question-as-of'),
+    path('answer-as-of/<int:pk>/', AnswerAsOfView.as_view(), name='answer-as-of'),
+    path('comment-as-of/<int:pk>/', CommentAsOfView.as_view(), name='comment-as-of'),
     path('get-all-questions/', UserQuestionsView.as_view(), name='get-all-questions'), #
     path('get-all-answers/', UserAnswersView.as_view(), name='get-all-answers'), #
     path('get-all-comments/', UserCommentsView.as_view(), name='get-all-comments'), #
@@ -53,6 +69,9 @@ urlpatterns = [
     path('answer-delete/<int:pk>/', DeleteAnswerView.as_view(), name='delete-answer'), #
     path('comment-delete/<int:pk>/', DeleteCommentView.as_view(), name='delete-comment'), #
     path('flag-content/', FlagContentView.as_view(), name='flag-content'),
+    path('detail-cache-stats/', DetailCacheStatsView.as_view(), name='detail-cache-stats'),
+    path('moderation/queue/', ModerationQueueView.as_view(), name='moderation-queue'),
+    path('moderation/actions/', ModerationActionView.as_view(), name='moderation-actions'),
 
 
     path('answers/<int:pk>/upvote/', UpvoteAnswerView.as_view(), name='upvote_answer'),
@@ -61,6 +80,7 @@ urlpatterns = [
     path('questions/<int:pk>/downvote/', DownvoteQuestionView.as_view(), name='downvote_question'),
     path('comments/<int:pk>/upvote/', UpvoteCommentView.as_view(), name='upvote_comment'),
     path('comments/<int:pk>/downvote/', DownvoteCommentView.as_view(), name='downvote_comment'),
+    path('my-votes/', MyVotesView.as_view(), name='my-votes'),
 
 
 
@@ -0,0 +1,122 @@
+import json
+
+from diff_match_patch import diff_match_patch
+from reversion.models import Version
+
+from .models import Question, Answer, Comment
+from .pagination import PAGE_SIZE
+
+
+# Fields of each model shown for a version with content, and those diffed as text
+CONTENT_FIELDS = {
+    Question: ('title', 'body', 'tags', 'views_count', 'upvotes', 'downvotes'),
+    Answer: ('body', 'upvotes', 'downvotes', 'is_accepted'),
+    Comment: ('content', 'question_id', 'answer_id'),
+}
+TEXT_FIELDS = {
+    Question: ('title', 'body'),
+    Answer: ('body',),
+    Comment: ('content',),
+}
+
+
+def version_page(model, pk, before=None, page_size=PAGE_SIZE, content=False, extra=0):
+    """
+    One page of the versions of an object, newest first, and the cursor of the next page.
+
+    Versions come with their revision in the same query. Without `content`
+    the serialized snapshots are not even read from the database. `before`
+    is the cursor returned with the previous page. `extra` more versions are
+    fetched past the page, but not counted in it, for diffing the last one.
+    """
+    versions = Version.objects.get_for_object_reference(model, pk).select_related('revision').order_by('-pk')
+    if not content:
+        versions = versions.defer('serialized_data', 'object_repr')
+    if before:
+        versions = versions.filter(pk__lt=before)
+    versions = list(versions[:page_size + max(extra, 1)])
+    next_cursor = str(versions[page_size - 1].pk) if len(versions) > page_size else None
+    return versions, next_cursor
+
+
+def version_state(version, model):
+    """The CONTENT_FIELDS of a version, read from its snapshot"""
+    if version.format == 'json':
+        return state_data(model, serialized_fields(version))
+    return {name: version.field_dict.get(name) for name in CONTENT_FIELDS[model]}
+
+
+def version_data(version, model, content=False):
+    revision = version.revision
+    data = {
+        'version_id': version.id,
+        'revision_id': revision.id if revision else None,  # Revision ID
+        'date_created': revision.date_created if revision else None,  # Date created from revision
+    }
+    if content:
+        for name, value in version_state(version, model).items():
+            data[name] = list(value or []) if name == 'tags' else value
+    return data
+
+
+def version_diffs(model, versions, page_size):
+    """
+    What changed in each of the first `page_size` versions since the version before it.
+
+    `versions` is newest first, a version without a predecessor in the list
+    is diffed against empty text. Text fields are given as diff-match-patch
+    patches, other fields only when their value changed.
+    """
+    dmp = diff_match_patch()
+    diffs = []
+    states = {version.pk: version_state(version, model) for version in versions[:page_size + 1]}
+    for version, previous in zip(versions[:page_size], versions[1:page_size + 1] + [None]):
+        fields = states[version.pk]
+        old = states[previous.pk] if previous is not None else {}
+        data = version_data(version, model)
+        data['previous_version_id'] = previous.id if previous is not None else None
+        data['patches'] = {}
+        for name in TEXT_FIELDS[model]:
+            before, after = old.get(name) or '', fields.get(name) or ''
+            if before != after:
+                data['patches'][name] = dmp.patch_toText(dmp.patch_make(before, after))
+        data['changes'] = {}
+        for name in CONTENT_FIELDS[model]:
+            if name in TEXT_FIELDS[model]:
+                continue
+            value, old_value = fields.get(name), old.get(name)
+            if name == 'tags':
+                value, old_value = sorted(value or []), sorted(old_value or [])
+            if value != old_value:
+                data['changes'][name] = value
+        diffs.append(data)
+    return diffs
+
+
+def serialized_fields(version):
+    """The field values stored in a version, as the JSON serializer wrote them"""
+    if version.format != 'json':
+        raise ValueError(f'Version {version.pk} is stored as {version.format}, not json')
+    return json.loads(version.serialized_data)[0]['fields']
+
+
+def state_data(model, fields):
+    """The CONTENT_FIELDS of a serialized state, which keys foreign keys by field name, not attname"""
+    return {name: fields.get(name.removesuffix('_id')) for name in CONTENT_FIELDS[model]}
+
+
+def as_of(model, pk, when):
+    """
+    The state of an object at `when`, as (version id, date, CONTENT_FIELDS), None before its first version.
+
+    Every version is a full snapshot, so exactly one is read. The versions of
+    the object are walked newest first through the unique (db, content_type,
+    object_id, revision) index of reversion until one whose revision was
+    created by `when`, revisions being numbered in the order they are saved.
+    """
+    version = Version.objects.get_for_object_reference(model, pk).filter(
+        revision__date_created__lte=when,
+    ).select_related('revision').order_by('-revision_id').first()
+    if version is None:
+        return None
+    return version.id, version.revision.date_created, state_data(model, serialized_fields(version))
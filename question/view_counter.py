@@ -0,0 +1,180 @@
+import atexit
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, transaction
+from django.db.models import F
+
+from .models import Question
+from .indexing import index_queue
+from .detail_cache import detail_cache
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULTS = {
+    'CACHE': 'default',  # alias in CACHES holding the pending views, shared by the worker processes
+    'FLUSH_INTERVAL': 30,  # seconds between scheduled flushes
+    'MAX_PENDING': 1000,  # views recorded by one process that force an early flush
+}
+
+DIRTY_KEY = 'views:dirty'
+LOCK_KEY = 'views:dirty:lock'
+LOCK_TIMEOUT = 5  # seconds, a holder killed with the lock only blocks the others this long
+
+
+def get_setting(name):
+    return getattr(settings, 'VIEW_COUNTER', {}).get(name, DEFAULTS[name])
+
+
+class ViewCounter:
+    """
+    Write-behind buffer for Question.views_count.
+
+    Detail reads only increment `views:<pk>` in the configured cache, the
+    question id is added to the `views:dirty` list when its count leaves 0.
+    Pending views are thus shared by every worker process and survive a
+    worker that is killed. A daemon thread in each process, or the
+    flush_view_counts command, drains them with one `F('views_count') + n`
+    UPDATE per question, every FLUSH_INTERVAL seconds or as soon as the
+    process recorded MAX_PENDING views.
+
+    Increments are atomic on the redis and locmem backends, the file backend
+    reads and writes the count and may lose a view to a concurrent one.
+    """
+
+    def __init__(self):
+        self._recorded = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    @property
+    def cache(self):
+        return caches[get_setting('CACHE')]
+
+    def record(self, question_id, count=1):
+        key = f'views:{question_id}'
+        try:
+            first = self.cache.incr(key, count) == count
+        except ValueError:
+            # No pending views, or evicted, a concurrent first view may have added the key meanwhile
+            first = self.cache.add(key, count, None)
+            if not first:
+                first = self.cache.incr(key, count) == count
+        if first:
+            self._mark_dirty([question_id])
+
+        with self._lock:
+            self._recorded += count
+            full = self._recorded >= get_setting('MAX_PENDING')
+            if full:
+                self._recorded = 0
+        self._ensure_flusher()
+        if full:
+            self._wakeup.set()
+
+    def pending(self):
+        """The views waiting in the cache, as {question id: views}"""
+        ids = self.cache.get(DIRTY_KEY) or []
+        counts = self.cache.get_many([f'views:{pk}' for pk in ids])
+        return {pk: counts[f'views:{pk}'] for pk in ids if counts.get(f'views:{pk}')}
+
+    def flush(self):
+        """Write the pending views of every process to the database and return how many questions were updated."""
+        with self._locked():
+            ids = self.cache.get(DIRTY_KEY) or []
+            self.cache.delete(DIRTY_KEY)
+        if not ids:
+            return 0
+
+        # Take what each count holds now, views recorded meanwhile stay for the next flush
+        batch, again = {}, []
+        counts = self.cache.get_many([f'views:{pk}' for pk in set(ids)])
+        for key, count in counts.items():
+            if not count:
+                continue
+            question_id = int(key.removeprefix('views:'))
+            batch[question_id] = count
+            try:
+                left = self.cache.decr(key, count)
+            except ValueError:
+                left = 0
+            if left > 0:
+                again.append(question_id)
+        if again:
+            self._mark_dirty(again)
+        if not batch:
+            return 0
+
+        try:
+            with transaction.atomic():
+                for question_id, count in batch.items():
+                    Question.objects.filter(pk=question_id).update(views_count=F('views_count') + count)
+        except Exception:
+            # Put the views back so the next flush retries them
+            for question_id, count in batch.items():
+                self.record(question_id, count)
+            raise
+
+        # queryset.update() skips post_save, so the counters are queued for a partial update here instead
+        for question_id in batch:
+            index_queue.mark(Question, question_id, fields=['views_count'])
+        detail_cache.bump(*batch)
+        return len(batch)
+
+    def _mark_dirty(self, question_ids):
+        with self._locked():
+            ids = self.cache.get(DIRTY_KEY) or []
+            self.cache.set(DIRTY_KEY, ids + list(question_ids), None)
+
+    @contextmanager
+    def _locked(self):
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while not self.cache.add(LOCK_KEY, 1, LOCK_TIMEOUT):
+            if time.monotonic() > deadline:
+                raise TimeoutError('The pending views list is still locked')
+            time.sleep(0.005)
+        try:
+            yield
+        finally:
+            self.cache.delete(LOCK_KEY)
+
+    def _ensure_flusher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='view-counter-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(get_setting('FLUSH_INTERVAL'))
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Flushing buffered view counts failed')
+                time.sleep(1)
+            finally:
+                close_old_connections()
+
+
+view_counter = ViewCounter()
+
+
+@atexit.register
+def _flush_on_exit():
+    # Only processes that recorded views, a management command exiting has nothing to add
+    if view_counter._thread is None:
+        return
+    try:
+        view_counter.flush()
+    except Exception:
+        logger.exception('Flushing buffered view counts at exit failed')
@@ -1,10 +1,11 @@
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, Http404
+from django.core.serializers.json import DjangoJSONEncoder
 from django.views import View
-from django.shortcuts import get_object_or_404, get_list_or_404
+from django.shortcuts import get_object_or_404
 from django.contrib.auth.mixins import LoginRequiredMixin
-from .models import Question, Answer, Comment, Tag, Flag, Vote
+from .models import Question, Answer, Comment, Tag, Flag, QuestionTag
 import json, math
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from rest_framework.views import APIView
@@ -12,17 +13,38 @@ from rest_framework import status
 import reversion
 from reversion.models import Version
 from .content_management.serializer import FlagSerializer, QuestionSerializer, AnswerSerializer, CommentSerializer
-from .content_management.validators import validate_no_contact_info, validate_for_malicious_content
+from .content_management.validators import validate_submission, changed_fields
 from django_ratelimit.decorators import ratelimit
-from django.db.models import Q
-from user.models import Profile
-from .documents import QuestionDocument, AnswerDocument, CommentDocument, TagDocument
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from user import reputation
+from .documents import QuestionDocument, AnswerDocument, CommentDocument, TagDocument, MAX_RESULT_WINDOW
+from .view_counter import view_counter
+from .detail_cache import detail_cache
+from .versioning import version_page, version_data, version_diffs, version_state, as_of
+from .conditional import make_etag, not_modified, with_etag, versions_etag, page_etag, PAGE_FIELDS
+from .tags import tag_resolver
+from .tag_index import tag_index
+from .votes import cast_vote, votes_for, VoteError, UPVOTE, DOWNVOTE
+from .flags import record_flag
+from . import moderation
+from .pagination import get_page, get_page_size, encode_cursor, decode_cursor, keyset_page, id_page
 
 # Define the rate limit handler
 def handle_ratelimit(request, exception):
     return JsonResponse({'error': "You've exceeded the rate limit. Please try again later."}, status=429)
 
 
+def vote_response(user, model, pk, vote_type):
+    """Cast the vote through the vote service and turn the outcome into a response"""
+    try:
+        result = cast_vote(user, model, pk, vote_type)
+    except VoteError as e:
+        return JsonResponse({'message': str(e)}, status=400)
+    return JsonResponse(result, status=200)
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 @method_decorator(ratelimit(key='user', rate='10/h', method='POST', block=True), name='dispatch')
 class CreateQuestionView(APIView):
@@ -41,31 +63,17 @@ class CreateQuestionView(APIView):
             return JsonResponse({'error': 'Title and body are required'}, status=400)
 
         try:
-            validate_no_contact_info(title,user=request.user)
-            validate_no_contact_info(body,user=request.user)
-            for taggy in tags:
-                validate_no_contact_info(taggy,user=request.user)
-                validate_for_malicious_content(taggy)
-            
-            validate_for_malicious_content(title)
-            validate_for_malicious_content(body)
+            validate_submission({'title': title, 'body': body, 'tags': tags}, user=request.user)
 
         except Exception as e:
             return JsonResponse({'error': f'Error Occured During Validation: {e}'}, status=404)
 
         question = Question.objects.create(user=request.user, title=title, body=body)
-        tag_objects = []
-        for tag in tags : 
-            Tag_obj, _ = Tag.objects.get_or_create(name=tag)
-            tag_objects.append(Tag_obj)
-            
-        question.tags.set(tag_objects)
+        question.tags.add(*tag_resolver.resolve(tags))
         question.save()
 
         # Increase reputation for creating the question
-        profile = get_object_or_404(Profile, user=request.user)
-        profile.reputation += 20  # Reward for creating a question
-        profile.save()
+        reputation.award(request.user, 20, 'QUESTION_CREATED', source=question)  # Reward for creating a question
 
         return JsonResponse({'message': 'Question created successfully', 'question_id': question.id}, status=201)
     
@@ -84,46 +92,42 @@ class UpdateQuestionView(APIView):
         # question_id = data.get('question_id')
         title = data.get('title')
         body = data.get('body')
-        tags = data.get('tags', [])
+        tags = data.get('tags')
 
         if title is None and body is None and not tags:
             return JsonResponse({'error': 'Tags, title, and body are required'}, status=400)
-        
-        try:
-            if title:
-                validate_no_contact_info(title,user=request.user)
-                validate_for_malicious_content(title)
-            if body:
-                validate_no_contact_info(body,user=request.user)
-                validate_for_malicious_content(body)
-            if tags:
-                for taggy in tags:
-                    validate_no_contact_info(taggy,user=request.user)
-                    validate_for_malicious_content(taggy)
-        except Exception as e:
-            return JsonResponse({'error': f'Error Occured During Validation: {e}'}, status=404)
 
         question = get_object_or_404(Question, pk=pk)
 
         # Ensure that only the author can update the question
-        if question.user != request.user:
+        if question.user_id != request.user.id:
             return JsonResponse({'error': 'You are not authorized to update this question'}, status=403)
 
-        if title is not None:
-            question.title = title
-        if body is not None:
-            question.body = body
+        # Only what differs from the stored question is validated and written
+        changed = changed_fields(question, {'title': title, 'body': body})
+        new_tags = []
+        if tags is not None:
+            current_tags = set(question.tags.values_list('name', flat=True))
+            if set(tags) != current_tags:
+                changed['tags'] = tags
+                new_tags = [tag for tag in tags if tag not in current_tags]
+        if not changed:
+            return JsonResponse({'message': 'Question updated successfully', 'changed': []}, status=200)
 
-        # Update tags
+        try:
+            validate_submission({**changed, 'tags': new_tags}, user=request.user)
+        except Exception as e:
+            return JsonResponse({'error': f'Error Occured During Validation: {e}'}, status=404)
+
+        changed_names = list(changed)
+        tags = changed.pop('tags', None)
         if tags is not None:
-            tag_objects = []
-            for tag in tags:
-                tag_obj, _ = Tag.objects.get_or_create(name=tag)
-                tag_objects.append(tag_obj)  
-            question.tags.set(tag_objects)
-        question.save()
+            question.tags.set(tag_resolver.resolve(tags))
+        for name, value in changed.items():
+            setattr(question, name, value)
+        question.save(update_fields=[*changed, 'updated'])
 
-        return JsonResponse({'message': 'Question updated successfully'}, status=200)
+        return JsonResponse({'message': 'Question updated successfully', 'changed': changed_names}, status=200)
 
 class GetQuestionVersionView(APIView):
     """Get the version of the question with the help of question id and version id"""
@@ -132,101 +136,131 @@ class GetQuestionVersionView(APIView):
     def get(self, request, pk, vid, *args, **kwargs):
         question = get_object_or_404(Question, pk=pk)
         try:
-            version = Version.objects.get(id=vid,object_id=question.pk)
+            version = Version.objects.get_for_object(question).get(id=vid)
         except reversion.Version.DoesNotExist:
             return JsonResponse({'error': 'Version not found'}, status=404)
 
+        state = version_state(version, Question)
         question_data = {
             'id': version.object_id,
-            'title': version.field_dict.get('title'),
-            'body': version.field_dict.get('body'),
-            'tags': list(version.field_dict.get('tags', [])),
-            'views_count': version.field_dict.get('views_count'),
-            'upvotes': version.field_dict.get('upvotes'),
-            'downvotes': version.field_dict.get('downvotes'),
+            'title': state.get('title'),
+            'body': state.get('body'),
+            'tags': list(state.get('tags') or []),
+            'views_count': state.get('views_count'),
+            'upvotes': state.get('upvotes'),
+            'downvotes': state.get('downvotes'),
         }
         return JsonResponse(question_data)
     
+def version_list_response(request, model, pk, diffs=False):
+    """
+    One page of the versions of an object, newest first, `before` is the cursor of the previous page.
+
+    Only the version and revision metadata are sent unless `content=1`, with
+    `diffs` each version carries what changed since the one before it.
+    """
+    etag = versions_etag(model, pk, 'diffs' if diffs else 'versions', request.GET.urlencode())
+    response = not_modified(request, etag)
+    if response is not None:
+        return response
+
+    get_object_or_404(model, pk=pk)
+    before = request.GET.get('before')
+    if before and not before.isdigit():
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    page_size = get_page_size(request.GET.get('page_size'))
+    content = diffs or request.GET.get('content') in ('1', 'true')
+    versions, next_cursor = version_page(model, pk, before, page_size, content=content, extra=1 if diffs else 0)
+
+    if diffs:
+        versions_data = version_diffs(model, versions, page_size)
+    else:
+        versions_data = [version_data(version, model, content) for version in versions[:page_size]]
+    return with_etag(JsonResponse({'versions': versions_data, 'next_cursor': next_cursor}), etag)
+
+
+def as_of_response(request, model, pk):
+    """The state of an object at the time given by `at`, an ISO 8601 datetime"""
+    when = parse_datetime(request.GET.get('at', ''))
+    if when is None:
+        return JsonResponse({'error': 'A valid "at" datetime is required'}, status=400)
+    if timezone.is_naive(when):
+        when = timezone.make_aware(when)
+
+    state = as_of(model, pk, when)
+    if state is None:
+        return JsonResponse({'error': 'No version exists at that time'}, status=404)
+    version_id, date_created, fields = state
+    return JsonResponse({'id': pk, 'version_id': version_id, 'date_created': date_created, **fields})
+
+
+class QuestionAsOfView(APIView):
+    """Get the question as it was at a point in time"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, *args, **kwargs):
+        return as_of_response(request, Question, pk)
+
+
+class AnswerAsOfView(APIView):
+    """Get the answer as it was at a point in time"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, *args, **kwargs):
+        return as_of_response(request, Answer, pk)
+
+
+class CommentAsOfView(APIView):
+    """Get the comment as it was at a point in time"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, *args, **kwargs):
+        return as_of_response(request, Comment, pk)
+
+
 class GetAllQuestionVersionsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, pk, *args, **kwargs):
-        # Fetch the question object
-        question = get_object_or_404(Question, pk=pk)
+        return version_list_response(request, Question, pk)
 
-        # Retrieve all versions for the specific question
-        versions = Version.objects.get_for_object(question)
-        
-        # Format the version data
-        versions_data = []
-        for version in versions:
-            revision = version.revision
-            versions_data.append({
-                'version_id': version.id,
-                'revision_id': revision.id if revision else None,  # Revision ID
-                'date_created': revision.date_created if revision else None,  # Date created from revision
-                'title': version.field_dict.get('title'),
-                'body': version.field_dict.get('body'),
-                'tags': list(version.field_dict.get('tags', [])),
-                'views_count': version.field_dict.get('views_count'),
-                'upvotes': version.field_dict.get('upvotes'),
-                'downvotes': version.field_dict.get('downvotes'),
-            })
-
-        return JsonResponse({'versions': versions_data})
-    
 
 class GetAllAnswerVersionsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, pk, *args, **kwargs):
-        # Fetch the answer object
-        answer = get_object_or_404(Answer, pk=pk)
+        return version_list_response(request, Answer, pk)
 
-        # Retrieve all versions for the specific answer
-        versions = Version.objects.get_for_object(answer)
-        
-        # Format the version data
-        versions_data = []
-        for version in versions:
-            revision = version.revision
-            versions_data.append({
-                'version_id': version.id,
-                'revision_id': revision.id if revision else None,  # Revision ID
-                'date_created': revision.date_created if revision else None,  # Date created from revision
-                'body': version.field_dict.get('body'),
-                'upvotes': version.field_dict.get('upvotes'),
-                'downvotes': version.field_dict.get('downvotes'),
-                'is_accepted': version.field_dict.get('is_accepted'),
-            })
-
-        return JsonResponse({'versions': versions_data})
-    
 
 class GetAllCommentVersionsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, pk, *args, **kwargs):
-        # Fetch the comment object
-        comment = get_object_or_404(Comment, pk=pk)
+        return version_list_response(request, Comment, pk)
+
+
+class QuestionVersionDiffsView(APIView):
+    """Patches between consecutive versions of a question"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, *args, **kwargs):
+        return version_list_response(request, Question, pk, diffs=True)
 
-        # Retrieve all versions for the specific comment
-        versions = Version.objects.get_for_object(comment)
-        
-        # Format the version data
-        versions_data = []
-        for version in versions:
-            revision = version.revision
-            versions_data.append({
-                'version_id': version.id,
-                'revision_id': revision.id if revision else None,  # Revision ID
-                'date_created': revision.date_created if revision else None,  # Date created from revision
-                'content': version.field_dict.get('content'),
-                'question_id': version.field_dict.get('question_id'),
-                'answer_id': version.field_dict.get('answer_id'),
-            })
 
-        return JsonResponse({'versions': versions_data})
+class AnswerVersionDiffsView(APIView):
+    """Patches between consecutive versions of an answer"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, *args, **kwargs):
+        return version_list_response(request, Answer, pk, diffs=True)
+
+
+class CommentVersionDiffsView(APIView):
+    """Patches between consecutive versions of a comment"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, *args, **kwargs):
+        return version_list_response(request, Comment, pk, diffs=True)
 
 
 
@@ -249,20 +283,22 @@ class UpdateAnswerView(APIView):
         answer = get_object_or_404(Answer, pk=pk)
 
         # Ensure that only the author can update the question
-        if answer.user != request.user:
+        if answer.user_id != request.user.id:
             return JsonResponse({'error': 'You are not authorized to update this answer'}, status=403)
+
+        changed = changed_fields(answer, {'body': body})
+        if not changed:
+            return JsonResponse({'message': 'Answer updated successfully', 'changed': []}, status=200)
         try:
-            if body:
-                validate_no_contact_info(body,user=request.user)
-                validate_for_malicious_content(body)
+            validate_submission(changed, user=request.user)
         except Exception as e:
             return JsonResponse({'error': f'Error Occured During Validation: {e}'}, status=404)
 
         answer.body = body
 
-        answer.save()
+        answer.save(update_fields=['body', 'updated'])
 
-        return JsonResponse({'message': 'Answer updated successfully'}, status=200)
+        return JsonResponse({'message': 'Answer updated successfully', 'changed': list(changed)}, status=200)
     
 @method_decorator(csrf_exempt, name='dispatch')
 class UpdateCommentView(APIView):
@@ -283,90 +319,159 @@ class UpdateCommentView(APIView):
         comment = get_object_or_404(Comment, pk=pk)
 
         # Ensure that only the author can update the question
-        if comment.user != request.user:
+        if comment.user_id != request.user.id:
             return JsonResponse({'error': 'You are not authorized person to update this comment'}, status=403)
+
+        changed = changed_fields(comment, {'content': body})
+        if not changed:
+            return JsonResponse({'message': 'Comment updated successfully', 'changed': []}, status=200)
         try:
-            if body:
-                validate_no_contact_info(body,user=request.user)
-                validate_for_malicious_content(body)
+            validate_submission(changed, user=request.user)
         except Exception as e:
             return JsonResponse({'error': f'Error Occured During Validation: {e}'}, status=404)
 
         comment.content = body
 
-        comment.save()
+        comment.save(update_fields=['content', 'updated'])
 
-        return JsonResponse({'message': 'Comment updated successfully'}, status=200)
+        return JsonResponse({'message': 'Comment updated successfully', 'changed': list(changed)}, status=200)
 
 
 
+def user_feed_response(request, queryset, serializer_class):
+    """
+    Page through a user's rows newest first.
+
+    `after` is the cursor of the previous page, sent back in the X-Next-Cursor
+    header, and `page_size` sets the page length. With `stream=1` the rows
+    after `after` are streamed as NDJSON, one page in memory at a time.
+    Pages carry an ETag, a poll whose If-None-Match still matches gets a 304
+    after reading only the fields page_etag is built from.
+    """
+    page_size = get_page_size(request.GET.get('page_size'))
+    after = request.GET.get('after')
+    stream = request.GET.get('stream') in ('1', 'true', 'ndjson')
+
+    etag = None
+    if not stream and request.META.get('HTTP_IF_NONE_MATCH'):
+        # Only the fields the ETag covers are read to answer a poll, the tags of questions come from their prefetch
+        fields = [name for name in ('id', 'created', 'updated', *PAGE_FIELDS) if hasattr(queryset.model, name)]
+        try:
+            meta, _ = keyset_page(queryset.only(*fields), after, page_size)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+        etag = page_etag(meta, after, page_size)
+        response = not_modified(request, etag)
+        if response is not None:
+            return response
+
+    try:
+        rows, next_cursor = keyset_page(queryset, after, page_size)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor'}, status=400)
+    if not rows and not after:
+        raise Http404('No %s found' % queryset.model._meta.verbose_name_plural)
+
+    if stream:
+        return StreamingHttpResponse(stream_feed(queryset, serializer_class, rows, next_cursor, page_size), content_type='application/x-ndjson')
+
+    response = JsonResponse(serializer_class(rows, many=True).data, safe=False)
+    response['ETag'] = etag or page_etag(rows, after, page_size)
+    if next_cursor:
+        response['X-Next-Cursor'] = next_cursor
+    return response
+
+
+def stream_feed(queryset, serializer_class, rows, cursor, page_size):
+    while True:
+        for item in serializer_class(rows, many=True).data:
+            yield json.dumps(item, cls=DjangoJSONEncoder) + '\n'
+        if not cursor:
+            return
+        rows, cursor = keyset_page(queryset, cursor, page_size)
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class UserQuestionsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        questions = get_list_or_404(Question, user=request.user)
-        serializer = QuestionSerializer(questions, many=True)
-        return JsonResponse(serializer.data, safe=False, json_dumps_params={'indent': 2})
+        questions = Question.objects.filter(user=request.user).prefetch_related('tags')
+        return user_feed_response(request, questions, QuestionSerializer)
     
 @method_decorator(csrf_exempt, name='dispatch')
 class UserAnswersView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        answers = get_list_or_404(Answer, user=request.user)
-        serializer = AnswerSerializer(answers, many=True)
-        return JsonResponse(serializer.data, safe=False, json_dumps_params={'indent': 2})
+        answers = Answer.objects.filter(user=request.user)
+        return user_feed_response(request, answers, AnswerSerializer)
     
 @method_decorator(csrf_exempt, name='dispatch')
 class UserCommentsView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        comments = get_list_or_404(Comment, user=request.user)
-        serializer = CommentSerializer(comments, many=True)
-        return JsonResponse(serializer.data, safe=False, json_dumps_params={'indent': 2})
+        comments = Comment.objects.filter(user=request.user)
+        return user_feed_response(request, comments, CommentSerializer)
 
 
 #==================================ADIL================================================================================
 
+def question_detail(pk):
+    """The payload of QuestionDetailView, None when the question does not exist"""
+    question = Question.objects.select_related('user').prefetch_related('tags').filter(id=pk).first()
+    if question is None:
+        return None
+    return {
+        'id': question.id,
+        'title': question.title,
+        'body': question.body,
+        'user': question.user.username,
+        'tags': [tag.name for tag in question.tags.all()],
+        'views_count': question.views_count,
+        'upvotes': question.upvotes,
+        'downvotes': question.downvotes,
+    }
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class QuestionDetailView(APIView):
     permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return self.detail(request, request.GET.get('id', 0))
+
     def post(self, request, *args, **kwargs):
         data = json.loads(request.body)
-        id_ = data.get('id', 0)  
-        if not id_:
+        return self.detail(request, data.get('id', 0))
+
+    def detail(self, request, id_):
+        if not id_ or not str(id_).isdigit():
             return JsonResponse({'error': 'Search query value is required or not valid'}, status=400)
+        pk = int(id_)
 
-        page = data.get('page', "0")  
-        if not str(page).isdigit() :
-            page = 0
-    
-        else : 
-            page = int(page)
-        results = Question.objects.filter(id = id_)
-        if not results :
-            return JsonResponse({'error': 'Searched question is not found'}, status=400)
-        else :
-            results = results.first()
-            
-        response_data = {
-                'id': results.id,  
-                'title': results.title,
-                'body': results.body,
-                'user': results.user.username,
-                'tags': [tag.name for tag in results.tags.all()],
-                'views_count': results.views_count,
-                'upvotes': results.upvotes,
-                'downvotes': results.downvotes,
-            }
-        results.views_count += 1
-        results.save()
-        return JsonResponse({'data': response_data}, status=status.HTTP_200_OK)
+        # The cache version changes with anything the payload shows, a match needs no payload at all
+        etag = make_etag('question', pk, detail_cache.version(pk))
+        response = not_modified(request, etag)
+        if response is None:
+            response_data = detail_cache.get(pk, question_detail)
+            if response_data is None:
+                return JsonResponse({'error': 'Searched question is not found'}, status=400)
+            response = with_etag(JsonResponse({'data': response_data}, status=status.HTTP_200_OK), etag)
+
+        # Buffered, the view is written to the database by the view counter flusher
+        view_counter.record(pk)
+        return response
 
 @method_decorator(csrf_exempt, name='dispatch')
 class FilterQuestionsView(APIView):
+    """
+    Search questions with pagination done by Elasticsearch.
+
+    Shallow pages use from/size, deeper pages are reached with the `cursor`
+    returned by the previous page, which is sent back to ES as search_after.
+    """
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
@@ -374,23 +479,37 @@ class FilterQuestionsView(APIView):
         query = data.get('query', '')  
         filter_by = data.get('filter_by', '')  
         sort_order = data.get('sort_order', 'desc')  
-        page = data.get('page', "1")  
-        
-        if not str(page).isdigit():
-            page = 1
-        else:
-            page = int(page)
+        page = get_page(data.get('page', "1"))
+        page_size = get_page_size(data.get('page_size'))
+        cursor = data.get('cursor')
 
         if not query:
             return JsonResponse({'error': 'Search query is required'}, status=400)
         
-        search = QuestionDocument.search().query("multi_match", query=query, fields=['title', 'body', 'tags'], type="best_fields", fuzziness='AUTO').sort('_score')
-        
+        search = QuestionDocument.search().query("multi_match", query=query, fields=['title', 'body', 'tags'], type="best_fields", fuzziness='AUTO')
+        order = 'asc' if sort_order == 'asc' else 'desc'
+
+        # Every sort ends on the question id so search_after has a stable position
+        if filter_by == 'date':
+            search = search.sort({'created': {'order': order}}, {'id': {'order': order}})
+        elif filter_by == 'popularity':
+            search = search.sort({'popularity': {'order': order}}, {'id': {'order': order}})
+        else:
+            search = search.sort('_score', {'id': {'order': 'desc'}})
+        search = search.extra(track_total_hits=True)
+
+        if cursor:
+            try:
+                search = search.extra(search_after=decode_cursor(cursor))[:page_size]
+            except ValueError:
+                return JsonResponse({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            start = (page - 1) * page_size
+            if start + page_size > MAX_RESULT_WINDOW:
+                return JsonResponse({'error': f"Pages beyond {MAX_RESULT_WINDOW // page_size} must be requested with the cursor of the previous page."}, status=status.HTTP_400_BAD_REQUEST)
+            search = search[start:start + page_size]
+
         try :
-            if filter_by == 'date':
-                search = search.sort('-created') if sort_order == 'desc' else search.sort('created')
-            elif filter_by == 'popularity':
-                search = search.sort('_score') 
             results = search.execute()
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
@@ -406,28 +525,22 @@ class FilterQuestionsView(APIView):
                 'upvotes': hit.upvotes,
                 'downvotes': hit.downvotes,
                 'created': hit.created,
-                'popularity': (hit.upvotes * 5) + (hit.views_count * 0.1)  
+                'popularity': hit.popularity,
             }
             for hit in results
         ]
 
-        if filter_by == 'popularity':
-            response_data.sort(key=lambda x: x['popularity'], reverse=(sort_order == 'desc'))
-        
+        total = results.hits.total.value
+        total_pages = math.ceil(total / page_size)
+        if not cursor and total_pages and page > total_pages:
+            return JsonResponse({'error': f"Page number must be between 1 and {total_pages}."}, status=status.HTTP_400_BAD_REQUEST)
+
         final_data = {}
-        total_pages = math.ceil(len(response_data) / 10)
+        final_data['total'] = total
         final_data['total_pages'] = total_pages
-        
-        if page > 0 :
-            if page < 1 or page > total_pages:
-                return JsonResponse({'error': f"Page number must be between 1 and {total_pages}."}, status=status.HTTP_400_BAD_REQUEST)
-            ending_ = page * 10
-            starting_ = page - 10
-        else :
-            ending_ = 10
-            starting_ = 0
-        final_data['questions'] = response_data[starting_ : ending_]
-        final_data['next_page'] = page + 1 if total_pages >= page + 1 else 1
+        final_data['questions'] = response_data
+        final_data['next_page'] = page + 1 if not cursor and total_pages >= page + 1 else None
+        final_data['next_cursor'] = encode_cursor(results.hits[-1].meta.sort) if len(results.hits) == page_size else None
 
         return JsonResponse({'data': final_data}, status=status.HTTP_200_OK)
 
@@ -448,28 +561,36 @@ class SearchTag(APIView):
         else:
             page = int(page)
 
-        
-        try:
-            search = TagDocument.search(index="tags").query(
-                "multi_match",
-                query=query,
-                fields=['name', 'description'],
-                type="best_fields",
-                fuzziness='AUTO'
-            )
-            results = search.execute()
-        except Exception as e:
-            return JsonResponse({'error': str(e)}, status=500)
 
-        
-        response_data = [
-            {
-                'id': hit.meta.id,  
-                'name': hit.name,
-                'description': hit.description,
-            }
-            for hit in results
-        ]
+        # Typeahead is served from the in-memory prefix index, Elasticsearch
+        # is only asked for fuzzy and description matches
+        response_data = []
+        if not data.get('fuzzy'):
+            response_data = [
+                {'id': str(tag['id']), 'name': tag['name'], 'description': tag['description']}
+                for tag in tag_index.search(query)
+            ]
+        if not response_data:
+            try:
+                search = TagDocument.search(index="tags").query(
+                    "multi_match",
+                    query=query,
+                    fields=['name', 'description'],
+                    type="best_fields",
+                    fuzziness='AUTO'
+                )
+                results = search.execute()
+            except Exception as e:
+                return JsonResponse({'error': str(e)}, status=500)
+
+            response_data = [
+                {
+                    'id': hit.meta.id,  
+                    'name': hit.name,
+                    'description': hit.description,
+                }
+                for hit in results
+            ]
 
         
         final_data = {}
@@ -481,7 +602,7 @@ class SearchTag(APIView):
             if page < 1 or page > total_pages:
                 return JsonResponse({'error': f"Page number must be between 1 and {total_pages}."}, status=status.HTTP_400_BAD_REQUEST)
             ending_ = page * 10
-            starting_ = page - 10
+            starting_ = ending_ - 10
         else :
             ending_ = 10
             starting_ = 0
@@ -493,6 +614,7 @@ class SearchTag(APIView):
 
 @method_decorator(csrf_exempt, name='dispatch')
 class TagsDetailView(APIView):
+    """List the questions of a tag, newest first, a page at a time"""
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
@@ -501,14 +623,29 @@ class TagsDetailView(APIView):
         if not query:
             return JsonResponse({'error': 'Search query is required'}, status=400)
 
-        page = data.get('page', "0")  
-        if not str(page).isdigit():
-            page = 0
-        else:
-            page = int(page)
+        page = get_page(data.get('page', "1"))
+        page_size = get_page_size(data.get('page_size'))
+        cursor = data.get('cursor')
         
-        tags = Tag.objects.filter(name = query)
-        results = Question.objects.filter(tags=tags.first())
+        tag = Tag.objects.filter(name=query).first()
+        if tag is None:
+            return JsonResponse({'error': 'Tag not found'}, status=404)
+
+        # Counted on the tag/question link table alone, without touching the questions
+        total = QuestionTag.objects.filter(tag_id=tag.id).count()
+        total_pages = math.ceil(total / page_size)
+        if not cursor and total_pages and page > total_pages:
+            return JsonResponse({'error': f"Page number must be between 1 and {total_pages}."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The page is read off the (tag, question) index newest first, without sorting the questions of the tag
+        links = QuestionTag.objects.filter(tag_id=tag.id)
+        try:
+            ids, next_cursor = id_page(links, 'question_id', cursor, page_size, offset=(page - 1) * page_size)
+        except ValueError:
+            return JsonResponse({'error': 'Invalid cursor'}, status=status.HTTP_400_BAD_REQUEST)
+        questions = Question.objects.select_related('user').prefetch_related('tags').in_bulk(ids)
+        results = [questions[pk] for pk in ids if pk in questions]
+
         response_data = [
             {
                 'id': hit.id,  
@@ -523,22 +660,12 @@ class TagsDetailView(APIView):
             for hit in results
         ]
 
-        
         final_data = {}
-        items_per_page = 10
-        total_pages = math.ceil(len(response_data) / items_per_page)
+        final_data['total'] = total
         final_data['total_pages'] = total_pages
-
-        if page > 0 :
-            if page < 1 or page > total_pages:
-                return JsonResponse({'error': f"Page number must be between 1 and {total_pages}."}, status=status.HTTP_400_BAD_REQUEST)
-            ending_ = page * 10
-            starting_ = page - 10
-        else :
-            ending_ = 10
-            starting_ = 0
-        final_data['tags'] = response_data[starting_ : ending_]
-        final_data['next_page'] = page + 1 if total_pages >= page + 1 else 1
+        final_data['tags'] = response_data
+        final_data['next_page'] = page + 1 if not cursor and total_pages >= page + 1 else None
+        final_data['next_cursor'] = next_cursor
         
         return JsonResponse({'data': final_data}, status=200)
 # @method_decorator(csrf_exempt, name="dispatch")
@@ -586,18 +713,14 @@ class CommentOnAnswerView(APIView):
             return JsonResponse({'error': 'Comment comment is required'}, status=400)
         
         try:
-            if content:
-                validate_no_contact_info(content,user=request.user)
-                validate_for_malicious_content(content)
+            validate_submission({'comment': content}, user=request.user)
         except Exception as e:
             return JsonResponse({'error': f'Error Occured During Validation: {e}'}, status=404)
 
         comment = Comment.objects.create(user=request.user, question=question, answer=answer, content=content)
         
         # Increase reputation for commenting
-        profile = get_object_or_404(Profile, user=request.user)
-        profile.reputation += 5  # Reward for commenting
-        profile.save()
+        reputation.award(request.user, 5, 'COMMENT_CREATED', source=comment)  # Reward for commenting
 
 
         return JsonResponse({'message': 'Comment created successfully', 'comment_id': comment.id}, status=201)
@@ -689,67 +812,7 @@ class UpvoteQuestionView(APIView):
     @method_decorator(csrf_exempt)
     @method_decorator(ratelimit(key='user', rate='30/h', method='POST', block=True))
     def post(self, request, pk, *args, **kwargs):
-        user = request.user
-        question = get_object_or_404(Question, pk=pk)
-
-        if question.user == user:
-            return JsonResponse({'message': 'You cannot upvote your own question'}, status=400)
-
-        # existing_vote = Vote.objects.filter(user=user, question=question).first()
-
-        # if existing_vote:
-        #     if existing_vote.vote_type == 'UPVOTE':
-        #         return JsonResponse({'message': 'Already upvoted'}, status=400)
-        #     elif existing_vote.vote_type == 'DOWNVOTE':
-        #         question.downvotes -= 1
-        #         question.upvotes += 1
-        #         existing_vote.vote_type = 'UPVOTE'
-        #         existing_vote.save()
-        #         question.save()
-        #         return JsonResponse({'message': 'Vote updated successfully', 'upvotes': question.upvotes, 'downvotes': question.downvotes}, status=200)
-        
-        # Vote.objects.create(user=user, question=question, vote_type='UPVOTE')
-        # question.upvotes += 1
-        # question.save()
-
-
-        existing_vote = Vote.objects.filter(user=user, question=question).first()
-
-        if existing_vote:
-            if existing_vote.vote_type == 'UPVOTE':
-                return JsonResponse({'message': 'Already upvoted'}, status=400)
-            elif existing_vote.vote_type == 'DOWNVOTE':
-                question.downvotes -= 1
-                question.upvotes += 1
-                existing_vote.vote_type = 'UPVOTE'
-                existing_vote.save()
-                question.save()
-
-                # Adjust reputation
-                profile_question = get_object_or_404(Profile, user=question.user)
-                profile_question.reputation += 7
-                profile_question.save()
-
-                profile_user = get_object_or_404(Profile, user=user)
-                profile_user.reputation += 1  # Small reward for the upvoter
-                profile_user.save()
-
-                return JsonResponse({'message': 'Vote updated successfully', 'upvotes': question.upvotes, 'downvotes': question.downvotes}, status=200)
-
-        Vote.objects.create(user=user, question=question, vote_type='UPVOTE')
-        question.upvotes += 1
-        question.save()
-
-        # Adjust reputation for the first upvote
-        profile_question = get_object_or_404(Profile, user=question.user)
-        profile_question.reputation += 5
-        profile_question.save()
-
-        profile_user = get_object_or_404(Profile, user=user)
-        profile_user.reputation += 1  # Small reward for the upvoter
-        profile_user.save()
-
-        return JsonResponse({'message': 'Question upvoted successfully', 'upvotes': question.upvotes}, status=200)
+        return vote_response(request.user, Question, pk, UPVOTE)
     
 class DownvoteQuestionView(APIView):
     permission_classes = [IsAuthenticated]
@@ -757,67 +820,7 @@ class DownvoteQuestionView(APIView):
     @method_decorator(csrf_exempt)
     @method_decorator(ratelimit(key='user', rate='30/h', method='POST', block=True))
     def post(self, request, pk, *args, **kwargs):
-        user = request.user
-        question = get_object_or_404(Question, pk=pk)
-
-        if question.user == user:
-            return JsonResponse({'message': 'You cannot downvote your own question'}, status=400)
-
-        # existing_vote = Vote.objects.filter(user=user, question=question).first()
-
-        # if existing_vote:
-        #     if existing_vote.vote_type == 'DOWNVOTE':
-        #         return JsonResponse({'message': 'Already downvoted'}, status=400)
-        #     elif existing_vote.vote_type == 'UPVOTE':
-        #         question.upvotes -= 1
-        #         question.downvotes += 1
-        #         existing_vote.vote_type = 'DOWNVOTE'
-        #         existing_vote.save()
-        #         question.save()
-        #         return JsonResponse({'message': 'Vote updated successfully', 'upvotes': question.upvotes, 'downvotes': question.downvotes}, status=200)
-        
-        # Vote.objects.create(user=user, question=question, vote_type='DOWNVOTE')
-        # question.downvotes += 1
-        # question.save()
-
-
-        existing_vote = Vote.objects.filter(user=user, question=question).first()
-
-        if existing_vote:
-            if existing_vote.vote_type == 'DOWNVOTE':
-                return JsonResponse({'message': 'Already downvoted'}, status=400)
-            elif existing_vote.vote_type == 'UPVOTE':
-                question.upvotes -= 1
-                question.downvotes += 1
-                existing_vote.vote_type = 'DOWNVOTE'
-                existing_vote.save()
-                question.save()
-
-                # Adjust reputation
-                profile_question = get_object_or_404(Profile, user=question.user)
-                profile_question.reputation -= 5
-                profile_question.save()
-
-                profile_user = get_object_or_404(Profile, user=user)
-                profile_user.reputation -= 1  # Penalty for downvoting
-                profile_user.save()
-
-                return JsonResponse({'message': 'Vote updated successfully', 'upvotes': question.upvotes, 'downvotes': question.downvotes}, status=200)
-
-        Vote.objects.create(user=user, question=question, vote_type='DOWNVOTE')
-        question.downvotes += 1
-        question.save()
-
-        # Adjust reputation for the first downvote
-        profile_question = get_object_or_404(Profile, user=question.user)
-        profile_question.reputation -= 2
-        profile_question.save()
-
-        profile_user = get_object_or_404(Profile, user=user)
-        profile_user.reputation -= 1  # Penalty for downvoting
-        profile_user.save()
-
-        return JsonResponse({'message': 'Question downvoted successfully', 'downvotes': question.downvotes}, status=200)
+        return vote_response(request.user, Question, pk, DOWNVOTE)
     
 class UpvoteCommentView(APIView):
     permission_classes = [IsAuthenticated]
@@ -825,66 +828,7 @@ class UpvoteCommentView(APIView):
     @method_decorator(csrf_exempt)
     @method_decorator(ratelimit(key='user', rate='30/h', method='POST', block=True))
     def post(self, request, pk, *args, **kwargs):
-        user = request.user
-        comment = get_object_or_404(Comment, pk=pk)
-
-        if comment.user == user:
-            return JsonResponse({'message': 'You cannot upvote your own comment'}, status=400)
-
-        # existing_vote = Vote.objects.filter(user=user, comment=comment).first()
-
-        # if existing_vote:
-        #     if existing_vote.vote_type == 'UPVOTE':
-        #         return JsonResponse({'message': 'Already upvoted'}, status=400)
-        #     elif existing_vote.vote_type == 'DOWNVOTE':
-        #         comment.downvotes -= 1
-        #         comment.upvotes += 1
-        #         existing_vote.vote_type = 'UPVOTE'
-        #         existing_vote.save()
-        #         comment.save()
-        #         return JsonResponse({'message': 'Vote updated successfully', 'upvotes': comment.upvotes, 'downvotes': comment.downvotes}, status=200)
-        
-        # Vote.objects.create(user=user, comment=comment, vote_type='UPVOTE')
-        # comment.upvotes += 1
-        # comment.save()
-
-        existing_vote = Vote.objects.filter(user=user, comment=comment).first()
-
-        if existing_vote:
-            if existing_vote.vote_type == 'UPVOTE':
-                return JsonResponse({'message': 'Already upvoted'}, status=400)
-            elif existing_vote.vote_type == 'DOWNVOTE':
-                comment.downvotes -= 1
-                comment.upvotes += 1
-                existing_vote.vote_type = 'UPVOTE'
-                existing_vote.save()
-                comment.save()
-
-                # Adjust reputation
-                profile_comment = get_object_or_404(Profile, user=comment.user)
-                profile_comment.reputation += 3
-                profile_comment.save()
-
-                profile_user = get_object_or_404(Profile, user=user)
-                profile_user.reputation += 1  # Small reward for the upvoter
-                profile_user.save()
-
-                return JsonResponse({'message': 'Vote updated successfully', 'upvotes': comment.upvotes, 'downvotes': comment.downvotes}, status=200)
-
-        Vote.objects.create(user=user, comment=comment, vote_type='UPVOTE')
-        comment.upvotes += 1
-        comment.save()
-
-        # Adjust reputation for the first upvote
-        profile_comment = get_object_or_404(Profile, user=comment.user)
-        profile_comment.reputation += 3
-        profile_comment.save()
-
-        profile_user = get_object_or_404(Profile, user=user)
-        profile_user.reputation += 1  # Small reward for the upvoter
-        profile_user.save()
-
-        return JsonResponse({'message': 'Comment upvoted successfully', 'upvotes': comment.upvotes}, status=200)
+        return vote_response(request.user, Comment, pk, UPVOTE)
     
 class DownvoteCommentView(APIView):
     permission_classes = [IsAuthenticated]
@@ -892,66 +836,32 @@ class DownvoteCommentView(APIView):
     @method_decorator(csrf_exempt)
     @method_decorator(ratelimit(key='user', rate='30/h', method='POST', block=True))
     def post(self, request, pk, *args, **kwargs):
-        user = request.user
-        comment = get_object_or_404(Comment, pk=pk)
-
-        if comment.user == user:
-            return JsonResponse({'message': 'You cannot downvote your own comment'}, status=400)
-
-        # existing_vote = Vote.objects.filter(user=user, comment=comment).first()
-
-        # if existing_vote:
-        #     if existing_vote.vote_type == 'DOWNVOTE':
-        #         return JsonResponse({'message': 'Already downvoted'}, status=400)
-        #     elif existing_vote.vote_type == 'UPVOTE':
-        #         comment.upvotes -= 1
-        #         comment.downvotes += 1
-        #         existing_vote.vote_type = 'DOWNVOTE'
-        #         existing_vote.save()
-        #         comment.save()
-        #         return JsonResponse({'message': 'Vote updated successfully', 'upvotes': comment.upvotes, 'downvotes': comment.downvotes}, status=200)
-        
-        # Vote.objects.create(user=user, comment=comment, vote_type='DOWNVOTE')
-        # comment.downvotes += 1
-        # comment.save()
+        return vote_response(request.user, Comment, pk, DOWNVOTE)
 
-        existing_vote = Vote.objects.filter(user=user, comment=comment).first()
 
-        if existing_vote:
-            if existing_vote.vote_type == 'DOWNVOTE':
-                return JsonResponse({'message': 'Already downvoted'}, status=400)
-            elif existing_vote.vote_type == 'UPVOTE':
-                comment.upvotes -= 1
-                comment.downvotes += 1
-                existing_vote.vote_type = 'DOWNVOTE'
-                existing_vote.save()
-                comment.save()
+MAX_VOTE_IDS = 500  # ids of each kind accepted by MyVotesView
 
-                # Adjust reputation
-                profile_comment = get_object_or_404(Profile, user=comment.user)
-                profile_comment.reputation -= 3
-                profile_comment.save()
 
-                profile_user = get_object_or_404(Profile, user=user)
-                profile_user.reputation -= 1  # Penalty for downvoting
-                profile_user.save()
-
-                return JsonResponse({'message': 'Vote updated successfully', 'upvotes': comment.upvotes, 'downvotes': comment.downvotes}, status=200)
-
-        Vote.objects.create(user=user, comment=comment, vote_type='DOWNVOTE')
-        comment.downvotes += 1
-        comment.save()
-
-        # Adjust reputation for the first downvote
-        profile_comment = get_object_or_404(Profile, user=comment.user)
-        profile_comment.reputation -= 2
-        profile_comment.save()
+class MyVotesView(APIView):
+    permission_classes = [IsAuthenticated]
 
-        profile_user = get_object_or_404(Profile, user=user)
-        profile_user.reputation -= 1  # Penalty for downvoting
-        profile_user.save()
+    def get(self, request, *args, **kwargs):
+        """How the caller voted on the comma separated ids in `questions`, `answers` and `comments`"""
+        ids = {}
+        for param in ('questions', 'answers', 'comments'):
+            values = [value for value in request.GET.get(param, '').split(',') if value]
+            if not all(value.isdigit() for value in values):
+                return JsonResponse({'error': f'{param} must be a comma separated list of ids'}, status=400)
+            if len(values) > MAX_VOTE_IDS:
+                return JsonResponse({'error': f'At most {MAX_VOTE_IDS} {param} per request'}, status=400)
+            ids[param] = [int(value) for value in values]
 
-        return JsonResponse({'message': 'Comment downvoted successfully', 'downvotes': comment.downvotes}, status=200)
+        votes = votes_for(request.user, ids['questions'], ids['answers'], ids['comments'])
+        return JsonResponse({
+            'questions': votes.get(Question, {}),
+            'answers': votes.get(Answer, {}),
+            'comments': votes.get(Comment, {}),
+        })
 
 
 
@@ -1025,7 +935,6 @@ class FlagContentView(APIView):
         }
 
         flagged_content = None
-        flagged_user = None
 
         # Associate the appropriate content with the flag
         if question_id:
@@ -1035,7 +944,6 @@ class FlagContentView(APIView):
                     return JsonResponse({"error": "You have already flagged this question."}, status=status.HTTP_400_BAD_REQUEST)
                 flagged_content = Question.objects.get(id=question_id)
                 flag_data['question'] = flagged_content.id
-                flagged_user = flagged_content.user
             except Question.DoesNotExist:
                 return JsonResponse({"error": "Question not found."}, status=status.HTTP_404_NOT_FOUND)
         
@@ -1046,7 +954,6 @@ class FlagContentView(APIView):
                     return JsonResponse({"error": "You have already flagged this answer."}, status=status.HTTP_400_BAD_REQUEST)
                 flagged_content = Answer.objects.get(id=answer_id)
                 flag_data['answer'] = flagged_content.id
-                flagged_user = flagged_content.user
             except Answer.DoesNotExist:
                 return JsonResponse({"error": "Answer not found."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -1057,7 +964,6 @@ class FlagContentView(APIView):
                     return JsonResponse({"error": "You have already flagged this comment."}, status=status.HTTP_400_BAD_REQUEST)
                 flagged_content = Comment.objects.get(id=comment_id)
                 flag_data['comment'] = flagged_content.id
-                flagged_user = flagged_content.user
             except Comment.DoesNotExist:
                 return JsonResponse({"error": "Comment not found."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -1065,26 +971,57 @@ class FlagContentView(APIView):
         serializer = FlagSerializer(data=flag_data)
         
         if serializer.is_valid():
-            serializer.save()
-
-            # Track flags for the flagged user and apply reputation penalty
-            flag_count = Flag.objects.filter(Q(question=flagged_content) | Q(answer=flagged_content) | Q(comment=flagged_content)).count()
-            
-            # Check if the flagged content has reached the penalty threshold
-            if flag_count >= 6:  # Threshold for reputation penalty
-                profile = get_object_or_404(Profile, user=flagged_user)
-                profile.reputation -= 100  # Apply reputation penalty
-                profile.reputation = max(1, profile.reputation)  # Ensure reputation doesn't drop below 1
-                profile.save()
-                # flagged_user.profile.reputation -= 100  # Apply reputation penalty
-                # flagged_user.profile.reputation = max(1, flagged_user.profile.reputation)  # Ensure reputation doesn't drop below 1
-                # flagged_user.profile.save()
+            with transaction.atomic():
+                serializer.save()
+
+                # Count the flag and apply the reputation penalty once the post reaches the threshold,
+                # the materializer keeps the reputation from dropping below 1
+                record_flag(flagged_content, actor=request.user)
 
             return JsonResponse(serializer.data, status=status.HTTP_201_CREATED)
 
         return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class DetailCacheStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        """Hits and misses of the question detail cache in the worker process answering the request"""
+        return JsonResponse(detail_cache.stats())
+
+
+class ModerationQueueView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        """Flagged posts with open flags, most flagged and longest waiting first, `after` is the cursor of the previous page"""
+        page_size = get_page_size(request.GET.get('page_size'))
+        try:
+            items, next_cursor = moderation.queue_page(request.GET.get('after'), page_size)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse({'items': items, 'next_cursor': next_cursor})
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ModerationActionView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        """Resolve, dismiss or delete a batch of flagged posts given as [{'type': 'question', 'id': 1}, ...]"""
+        action = request.data.get('action')
+        if action not in moderation.ACTIONS:
+            return JsonResponse({'error': f"action must be one of {', '.join(moderation.ACTIONS)}"}, status=400)
+        try:
+            by_model = moderation.parse_items(request.data.get('items'))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        count = moderation.ACTIONS[action](by_model)
+        return JsonResponse({'action': action, 'count': count}, status=200)
+
+
 # ================================= NEW API's WITH REPUTATION ADDED ===================================================================
 
 
@@ -1110,9 +1047,7 @@ class AnswerQuestionView(APIView):
             return JsonResponse({'error': 'Answer body is required'}, status=400)
         
         try:
-            if body:
-                validate_no_contact_info(body,user=request.user)
-                validate_for_malicious_content(body)
+            validate_submission({'body': body}, user=request.user)
         except Exception as e:
             return JsonResponse({'error': f'Error Occured During Validation: {e}'}, status=404)
 
@@ -1120,9 +1055,7 @@ class AnswerQuestionView(APIView):
         
 
         # Increase reputation for answering the question
-        profile = get_object_or_404(Profile, user=request.user)
-        profile.reputation += 10
-        profile.save()
+        reputation.award(request.user, 10, 'ANSWER_CREATED', source=answer)
 
 
         return JsonResponse({'message': 'Answer created successfully', 'answer_id': answer.id}, status=201)
@@ -1145,9 +1078,7 @@ class AcceptAnswerView(APIView):
         answer.save()
 
         # Increase reputation for accepted answer
-        profile = get_object_or_404(Profile, user=answer.user)
-        profile.reputation += 15
-        profile.save()
+        reputation.award(answer.user_id, 15, 'ANSWER_ACCEPTED', actor=request.user, source=answer)
 
         return JsonResponse({'message': 'Answer accepted successfully'}, status=200)
 
@@ -1158,63 +1089,7 @@ class UpvoteAnswerView(APIView):
     @method_decorator(csrf_exempt)
     @method_decorator(ratelimit(key='user', rate='30/h', method='POST', block=True))
     def post(self, request, pk, *args, **kwargs):
-        user = request.user
-        answer = get_object_or_404(Answer, pk=pk)
-
-        if answer.user == user:
-            return JsonResponse({'message': 'You cannot upvote your own answer'}, status=400)
-
-        existing_vote = Vote.objects.filter(user=user, answer=answer).first()
-
-        if existing_vote:
-            if existing_vote.vote_type == 'UPVOTE':
-                return JsonResponse({'message': 'Already upvoted'}, status=400)
-            elif existing_vote.vote_type == 'DOWNVOTE':
-                answer.downvotes -= 1
-                answer.upvotes += 1
-                existing_vote.vote_type = 'UPVOTE'
-                existing_vote.save()
-                answer.save()
-
-                # # Adjust reputation
-                # answer.user.reputation += 7
-                # user.reputation += 1  # Small reward for the upvoter
-                # answer.user.save()
-                # user.save()
-
-
-                # Adjust reputation
-                profile_answer = get_object_or_404(Profile, user=answer.user)
-                profile_answer.reputation += 5
-                profile_answer.save()
-
-                profile_user = get_object_or_404(Profile, user=user)
-                profile_user.reputation += 1  # Small reward for the upvoter
-                profile_user.save()
-
-                return JsonResponse({'message': 'Vote updated successfully', 'upvotes': answer.upvotes, 'downvotes': answer.downvotes}, status=200)
-
-        Vote.objects.create(user=user, answer=answer, vote_type='UPVOTE')
-        answer.upvotes += 1
-        answer.save()
-
-        # # Adjust reputation for the first upvote
-        # answer.user.reputation += 5
-        # user.reputation += 1  # Small reward for the upvoter
-        # answer.user.save()
-        # user.save()
-
-
-        # Adjust reputation for the first upvote
-        profile_answer = get_object_or_404(Profile, user=answer.user)
-        profile_answer.reputation += 5
-        profile_answer.save()
-
-        profile_user = get_object_or_404(Profile, user=user)
-        profile_user.reputation += 1  # Small reward for the upvoter
-        profile_user.save()
-
-        return JsonResponse({'message': 'Answer upvoted successfully', 'upvotes': answer.upvotes}, status=200)
+        return vote_response(request.user, Answer, pk, UPVOTE)
 
 
 class DownvoteAnswerView(APIView):
@@ -1223,62 +1098,7 @@ class DownvoteAnswerView(APIView):
     @method_decorator(csrf_exempt)
     @method_decorator(ratelimit(key='user', rate='30/h', method='POST', block=True))
     def post(self, request, pk, *args, **kwargs):
-        user = request.user
-        answer = get_object_or_404(Answer, pk=pk)
-
-        if answer.user == user:
-            return JsonResponse({'message': 'You cannot downvote your own answer'}, status=400)
-
-        existing_vote = Vote.objects.filter(user=user, answer=answer).first()
-
-        if existing_vote:
-            if existing_vote.vote_type == 'DOWNVOTE':
-                return JsonResponse({'message': 'Already downvoted'}, status=400)
-            elif existing_vote.vote_type == 'UPVOTE':
-                answer.upvotes -= 1
-                answer.downvotes += 1
-                existing_vote.vote_type = 'DOWNVOTE'
-                existing_vote.save()
-                answer.save()
-
-                # # Adjust reputation
-                # answer.user.reputation -= 5
-                # user.reputation -= 1  # Penalty for downvoting
-                # answer.user.save()
-                # user.save()
-
-
-                # Adjust reputation
-                profile_answer = get_object_or_404(Profile, user=answer.user)
-                profile_answer.reputation -= 5
-                profile_answer.save()
-
-                profile_user = get_object_or_404(Profile, user=user)
-                profile_user.reputation -= 1  # Penalty for downvoting
-                profile_user.save()
-
-                return JsonResponse({'message': 'Vote updated successfully', 'upvotes': answer.upvotes, 'downvotes': answer.downvotes}, status=200)
-
-        Vote.objects.create(user=user, answer=answer, vote_type='DOWNVOTE')
-        answer.downvotes += 1
-        answer.save()
-
-        # # Adjust reputation for the first downvote
-        # answer.user.reputation -= 2
-        # user.reputation -= 1  # Penalty for downvoting
-        # answer.user.save()
-        # user.save()
-
-        # Adjust reputation for the first downvote
-        profile_answer = get_object_or_404(Profile, user=answer.user)
-        profile_answer.reputation -= 2
-        profile_answer.save()
-
-        profile_user = get_object_or_404(Profile, user=user)
-        profile_user.reputation -= 1  # Penalty for downvoting
-        profile_user.save()
-
-        return JsonResponse({'message': 'Answer downvoted successfully', 'downvotes': answer.downvotes}, status=200)
+        return vote_response(request.user, Answer, pk, DOWNVOTE)
 
 #======================= Answer BLOCK ===================================================================================================
 
@@ -0,0 +1,178 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.shortcuts import get_object_or_404
+
+from user import reputation
+from .models import Question, Answer, Comment, Vote
+from .indexing import index_queue
+from .detail_cache import detail_cache
+
+
+DEFAULTS = {
+    'CACHE': 'default',  # alias in CACHES holding each user's votes, None reads them from the database every time
+    'TIMEOUT': 300,  # seconds a user's votes are kept, also bounds a read racing the user's own vote
+    'MAX_CACHED': 5000,  # users with more votes of one kind are always read from the database
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'MY_VOTES', {}).get(name, DEFAULTS[name])
+
+
+UPVOTE = 'UPVOTE'
+DOWNVOTE = 'DOWNVOTE'
+
+COUNTER_FIELDS = {
+    UPVOTE: 'upvotes',
+    DOWNVOTE: 'downvotes',
+}
+
+VALUES = {
+    UPVOTE: Vote.UPVOTE,
+    DOWNVOTE: Vote.DOWNVOTE,
+}
+
+TARGET_TYPES = {
+    Question: Vote.QUESTION,
+    Answer: Vote.ANSWER,
+    Comment: Vote.COMMENT,
+}
+
+VOTE_TYPES = {value: vote_type for vote_type, value in VALUES.items()}
+
+# Reputation change as (author, voter) for a first vote and for a vote that switches side
+REPUTATION_RULES = {
+    (Question, UPVOTE): {'new': (5, 1), 'switch': (7, 1)},
+    (Question, DOWNVOTE): {'new': (-2, -1), 'switch': (-5, -1)},
+    (Answer, UPVOTE): {'new': (5, 1), 'switch': (5, 1)},
+    (Answer, DOWNVOTE): {'new': (-2, -1), 'switch': (-5, -1)},
+    (Comment, UPVOTE): {'new': (3, 1), 'switch': (3, 1)},
+    (Comment, DOWNVOTE): {'new': (-2, -1), 'switch': (-3, -1)},
+}
+
+
+class VoteError(Exception):
+    """Raised when a vote is rejected, the message is returned to the client."""
+
+
+def cast_vote(user, model, pk, vote_type):
+    """
+    Record `user`'s vote on the `model` row `pk` and return the response payload.
+
+    Everything happens in one transaction: the target row is locked, the Vote
+    row is switched or inserted, the counters move through F() expressions and
+    both reputation changes go to the ledger in a single INSERT, so concurrent
+    votes never overwrite each other.
+    """
+    name = model._meta.model_name
+    value = VALUES[vote_type]
+    verb = vote_type.lower()
+    counter = COUNTER_FIELDS[vote_type]
+    opposite = COUNTER_FIELDS[DOWNVOTE if vote_type == UPVOTE else UPVOTE]
+
+    with transaction.atomic():
+        target = get_object_or_404(model.objects.select_for_update().only('id', 'user_id'), pk=pk)
+        if target.user_id == user.id:
+            raise VoteError(f'You cannot {verb} your own {name}')
+
+        # Conditional upsert: flip an opposite vote in place, otherwise insert a new one,
+        # the unique constraint rejects a repeated vote without reading it first
+        vote = {'user': user, 'target_type': TARGET_TYPES[model], 'target_id': pk}
+        switched = Vote.objects.filter(**vote).exclude(value=value).update(value=value)
+        if not switched:
+            try:
+                with transaction.atomic():
+                    Vote.objects.create(**vote, value=value)
+            except IntegrityError:
+                raise VoteError(f'Already {verb}d')
+
+        counters = {counter: F(counter) + 1}
+        if switched:
+            counters[opposite] = F(opposite) - 1
+        model.objects.filter(pk=pk).update(**counters)
+
+        author_delta, voter_delta = REPUTATION_RULES[(model, vote_type)]['switch' if switched else 'new']
+        reputation.award_many([
+            reputation.event(target.user_id, author_delta, 'VOTE_RECEIVED', actor=user, source=target),
+            reputation.event(user, voter_delta, 'VOTE_CAST', source=target),
+        ])
+
+        votes = model.objects.values('upvotes', 'downvotes').get(pk=pk)
+        # queryset.update() skips post_save, so the counters are queued for a partial update here instead
+        transaction.on_commit(lambda: index_queue.mark(model, pk, fields=list(counters)))
+        if model is Question:
+            transaction.on_commit(lambda: detail_cache.bump(pk))
+        transaction.on_commit(lambda: forget_votes(user.id, model))
+
+    if switched:
+        return {'message': 'Vote updated successfully', 'upvotes': votes['upvotes'], 'downvotes': votes['downvotes']}
+    return {'message': f'{model.__name__} {verb}d successfully', counter: votes[counter]}
+
+
+
+def votes_for(user, question_ids=(), answer_ids=(), comment_ids=()):
+    """
+    How `user` voted on the given posts, as {Question: {id: UPVOTE, ...}, Answer: ..., Comment: ...}.
+
+    Posts the user did not vote on are left out. Without a cache each kind
+    of post costs one query probing the unique (user, target_type,
+    target_id) index. With MY_VOTES['CACHE'] set, all the votes of the user
+    on each kind of post are kept in the cache and fetched in one round
+    trip, a miss loads them with one query per kind.
+    """
+    wanted = {model: set(ids) for model, ids in ((Question, question_ids), (Answer, answer_ids), (Comment, comment_ids)) if ids}
+    votes = {model: {} for model in wanted}
+    if get_setting('CACHE') is None:
+        for model, ids in wanted.items():
+            votes[model] = _load_votes(user.id, model, ids)
+        return votes
+
+    cache = caches[get_setting('CACHE')]
+    keys = {model: _cache_key(user.id, model) for model in wanted}
+    cached = cache.get_many(keys.values())
+    for model, ids in wanted.items():
+        if keys[model] not in cached:
+            # Too many to cache is remembered as False
+            loaded = _load_votes(user.id, model, limit=get_setting('MAX_CACHED'))
+            cached[keys[model]] = loaded if loaded is not None else False
+            cache.set(keys[model], cached[keys[model]], get_setting('TIMEOUT'))
+        if cached[keys[model]] is False:
+            votes[model] = _load_votes(user.id, model, ids)
+        else:
+            votes[model] = {pk: vote_type for pk, vote_type in cached[keys[model]].items() if pk in ids}
+    return votes
+
+
+def forget_votes(user_id, *models):
+    """Drop the cached votes of a user, on every kind of post by default"""
+    if get_setting('CACHE') is not None:
+        caches[get_setting('CACHE')].delete_many([_cache_key(user_id, model) for model in models or TARGET_TYPES])
+
+
+def _load_votes(user_id, model, ids=None, limit=None):
+    votes = Vote.objects.filter(user_id=user_id, target_type=TARGET_TYPES[model])
+    if ids is not None:
+        votes = votes.filter(target_id__in=ids)
+    rows = votes.values_list('target_id', 'value')
+    if limit is not None:
+        rows = rows[:limit + 1]
+    rows = list(rows)
+    if limit is not None and len(rows) > limit:
+        return None
+    return {target_id: VOTE_TYPES[value] for target_id, value in rows}
+
+
+def _cache_key(user_id, model):
+    return f'votes:{user_id}:{TARGET_TYPES[model]}'
+
+
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=Answer)
+@receiver(post_delete, sender=Comment)
+def _delete_votes(sender, instance, **kwargs):
+    # Votes have no foreign key to their post, nothing cascades to them
+    Vote.objects.filter(target_type=TARGET_TYPES[sender], target_id=instance.pk).delete()
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from user.reputation import materialize
+
+
+class Command(BaseCommand):
+    help = 'Fold pending reputation ledger entries into Profile.reputation.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--interval', type=float, default=0, help='Keep running, materializing every INTERVAL seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            applied = materialize(batch_size=options['batch_size'])
+            self.stdout.write(f'Materialized {applied} reputation events')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.1 on 2026-10-17 04:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Profile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mobile_number', models.CharField(blank=True, max_length=15, null=True)),
+                ('city', models.CharField(blank=True, max_length=100, null=True)),
+                ('reputation', models.IntegerField(default=1)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ReputationEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reason', models.CharField(choices=[('QUESTION_CREATED', 'Question created'), ('ANSWER_CREATED', 'Answer created'), ('COMMENT_CREATED', 'Comment created'), ('ANSWER_ACCEPTED', 'Answer accepted'), ('VOTE_RECEIVED', 'Vote received'), ('VOTE_CAST', 'Vote cast'), ('FLAG_PENALTY', 'Flag penalty')], max_length=20)),
+                ('delta', models.IntegerField()),
+                ('object_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('materialized', models.BooleanField(db_index=True, default=False)),
+                ('actor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('content_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='contenttypes.contenttype')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reputation_events', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
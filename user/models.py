@@ -1,6 +1,8 @@
 
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -10,3 +12,29 @@ class Profile(models.Model):
 
     def __str__(self):
         return self.user.username
+
+
+class ReputationEvent(models.Model):
+    """Append-only ledger of reputation changes, folded into Profile.reputation by the materializer"""
+    REASONS = [
+        ('QUESTION_CREATED', 'Question created'),
+        ('ANSWER_CREATED', 'Answer created'),
+        ('COMMENT_CREATED', 'Comment created'),
+        ('ANSWER_ACCEPTED', 'Answer accepted'),
+        ('VOTE_RECEIVED', 'Vote received'),
+        ('VOTE_CAST', 'Vote cast'),
+        ('FLAG_PENALTY', 'Flag penalty'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reputation_events')
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    reason = models.CharField(choices=REASONS, max_length=20)
+    delta = models.IntegerField()
+    content_type = models.ForeignKey(ContentType, on_delete=models.SET_NULL, null=True, blank=True)
+    object_id = models.PositiveBigIntegerField(null=True, blank=True)
+    source = GenericForeignKey('content_type', 'object_id')
+    created = models.DateTimeField(auto_now_add=True)
+    materialized = models.BooleanField(default=False, db_index=True)
+
+    def __str__(self):
+        return f'{self.delta:+d} to {self.user_id} for {self.reason}'
@@ -0,0 +1,104 @@
+from collections import defaultdict
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import Profile, ReputationEvent
+
+
+# Reasons whose penalty may not push a profile below this floor
+FLOORED_REASONS = {'FLAG_PENALTY'}
+REPUTATION_FLOOR = 1
+
+
+def event(user, delta, reason, actor=None, source=None):
+    """Build an unsaved ledger entry, `user` and `actor` may be users or user ids"""
+    entry = ReputationEvent(reason=reason, delta=delta)
+    entry.user_id = getattr(user, 'pk', user)
+    entry.actor_id = getattr(actor, 'pk', actor)
+    if source is not None:
+        entry.content_type = ContentType.objects.get_for_model(source)
+        entry.object_id = source.pk
+    return entry
+
+
+def award(user, delta, reason, actor=None, source=None):
+    """Record a single reputation change, this is one INSERT and never touches Profile"""
+    entry = event(user, delta, reason, actor=actor, source=source)
+    entry.save()
+    return entry
+
+
+def award_many(events):
+    """Record several reputation changes built with `event()` in one INSERT"""
+    return ReputationEvent.objects.bulk_create(events)
+
+
+def replay(reputation, events):
+    """
+    Apply (delta, reason) changes to `reputation` in order.
+
+    A floored reason never leaves it below REPUTATION_FLOOR at that point,
+    as max(1, reputation - 100) did for a flag penalty, so 50, then -100
+    and +20 ends at 21. Other changes are plain additions.
+    """
+    for delta, reason in events:
+        reputation += delta
+        if reason in FLOORED_REASONS:
+            reputation = max(reputation, REPUTATION_FLOOR)
+    return reputation
+
+
+def pending_events(user):
+    """The (delta, reason) changes of `user` not yet folded into the profile, oldest first"""
+    return list(ReputationEvent.objects.filter(user=user, materialized=False).order_by('id').values_list('delta', 'reason'))
+
+
+def current_reputation(user):
+    """Reputation including changes still waiting for the materializer, floored the same way"""
+    return replay(user.profile.reputation, pending_events(user))
+
+
+def materialize(batch_size=1000):
+    """
+    Fold pending ledger entries into Profile.reputation.
+
+    Entries are taken oldest first in batches. Each batch is summed per user
+    and applied with a single CASE UPDATE on Profile, then marked as
+    materialized in the same transaction. Users with a floored entry in the
+    batch are replayed entry by entry from their locked current reputation
+    instead, since the floor applies at the point of the penalty. Returns
+    how many entries were applied.
+    """
+    applied = 0
+    while True:
+        with transaction.atomic():
+            batch = list(
+                ReputationEvent.objects.filter(materialized=False)
+                .order_by('id')
+                .values_list('id', 'user_id', 'delta', 'reason')[:batch_size]
+            )
+            if not batch:
+                return applied
+
+            events = defaultdict(list)
+            for _, user_id, delta, reason in batch:
+                events[user_id].append((delta, reason))
+            floored = [user_id for user_id, entries in events.items() if any(reason in FLOORED_REASONS for _, reason in entries)]
+            current = {}
+            if floored:
+                current = dict(Profile.objects.select_for_update().filter(user_id__in=floored).values_list('user_id', 'reputation'))
+
+            whens = []
+            for user_id, entries in events.items():
+                if user_id in current:
+                    whens.append(When(user_id=user_id, then=Value(replay(current[user_id], entries))))
+                else:
+                    whens.append(When(user_id=user_id, then=F('reputation') + Value(sum(delta for delta, _ in entries))))
+            Profile.objects.filter(user_id__in=events).update(
+                reputation=Case(*whens, default=F('reputation'), output_field=IntegerField())
+            )
+
+            ReputationEvent.objects.filter(id__in=[entry[0] for entry in batch]).update(materialized=True)
+            applied += len(batch)
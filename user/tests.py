@@ -1,3 +1,61 @@
+from django.contrib.auth.models import User
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Profile, ReputationEvent
+from . import reputation
+
+
+class ReputationLedgerTests(TestCase):
+    """user.reputation: ledger entries, the materializer and the flag penalty floor"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='member')
+        self.other = User.objects.create_user(username='other')
+        Profile.objects.filter(user=self.user).update(reputation=50)
+
+    def profile(self, user):
+        return Profile.objects.get(user=user).reputation
+
+    def test_award_only_writes_the_ledger(self):
+        entry = reputation.award(self.user, 5, 'VOTE_RECEIVED', actor=self.other)
+        self.assertEqual((entry.user_id, entry.actor_id, entry.delta, entry.materialized), (self.user.pk, self.other.pk, 5, False))
+        self.assertEqual(self.profile(self.user), 50)
+        self.assertEqual(reputation.current_reputation(User.objects.get(pk=self.user.pk)), 55)
+
+    def test_materialize_sums_per_user(self):
+        reputation.award_many([
+            reputation.event(self.user, 5, 'VOTE_RECEIVED'),
+            reputation.event(self.other, -1, 'VOTE_CAST'),
+            reputation.event(self.user, -2, 'VOTE_RECEIVED'),
+        ])
+        self.assertEqual(reputation.materialize(), 3)
+        self.assertEqual((self.profile(self.user), self.profile(self.other)), (53, 0))
+        self.assertFalse(ReputationEvent.objects.filter(materialized=False).exists())
+        self.assertEqual(reputation.materialize(), 0)
+
+    def test_penalty_floor_applies_at_the_penalty(self):
+        # max(1, 50 - 100) = 1, then + 20
+        reputation.award(self.user, -100, 'FLAG_PENALTY')
+        reputation.award(self.user, 20, 'VOTE_RECEIVED')
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(reputation.current_reputation(user), 21)
+        reputation.materialize()
+        self.assertEqual(self.profile(self.user), 21)
+
+    def test_penalty_floor_across_batches(self):
+        reputation.award(self.user, 20, 'VOTE_RECEIVED')
+        reputation.award(self.user, -100, 'FLAG_PENALTY')
+        reputation.award(self.user, 3, 'VOTE_RECEIVED')
+        reputation.materialize(batch_size=2)
+        self.assertEqual(self.profile(self.user), 4)
+
+    def test_current_reputation_is_never_below_the_floor_after_a_penalty(self):
+        reputation.award(self.user, -100, 'FLAG_PENALTY')
+        self.assertEqual(reputation.current_reputation(User.objects.get(pk=self.user.pk)), 1)
+
+    def test_other_changes_are_not_floored(self):
+        Profile.objects.filter(user=self.user).update(reputation=1)
+        reputation.award(self.user, -2, 'VOTE_RECEIVED')
+        self.assertEqual(reputation.current_reputation(User.objects.get(pk=self.user.pk)), -1)
+        reputation.materialize()
+        self.assertEqual(self.profile(self.user), -1)
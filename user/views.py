@@ -7,6 +7,7 @@ from django.contrib.auth import authenticate
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from .models import Profile
+from .reputation import current_reputation
 
 
 @api_view(['POST'])
@@ -65,5 +66,5 @@ class ProfileView(APIView):
             'email': request.user.email,
             'mobile_number': profile.mobile_number,
             'city': profile.city,
-            'reputation': profile.reputation
+            'reputation': current_reputation(request.user)
         })
\ No newline at end of file